@@ -25,6 +25,8 @@ from app.models.user import User
 import os
 import shutil
 import json
+import asyncio
+import aiofiles
 
 router = APIRouter(prefix="/admin", tags=["administration"])
 
@@ -168,8 +170,8 @@ async def upload_company_documents(
             
             # Guardar archivo
             file_path = f"{company_dir}/{file.filename}"
-            with open(file_path, "wb") as buffer:
-                buffer.write(content)
+            async with aiofiles.open(file_path, "wb") as buffer:
+                await buffer.write(content)
             
             # Registrar en base de datos con categoria
             document = CompanyDocumentService.create_document(
@@ -217,7 +219,7 @@ async def upload_company_documents(
                 "category": category.value,
                 "description": description,
                 "priority": priority,
-                "size": os.path.getsize(file_path),
+                "size": len(content),
                 "vectorized": len(chunk_ids) > 0,
                 "chunks_created": len(chunk_ids)
             })
@@ -293,7 +295,10 @@ async def delete_company_document(
     db: Session = Depends(get_db)
 ):
     """Eliminar un documento de una compania"""
-    success = CompanyDocumentService.delete_document(db, company_id, document_id)
+    # La eliminacion borra el archivo fisico: ejecutarla fuera del event loop
+    success = await asyncio.to_thread(
+        CompanyDocumentService.delete_document, db, company_id, document_id
+    )
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -411,7 +416,7 @@ async def delete_company(
 ):
     """Eliminar permanentemente una compania y sus datos asociados"""
     # Usamos deactivacion por ahora o implementamos borrado fisico
-    success = CompanyService.delete_company_complete(db, company_id)
+    success = await asyncio.to_thread(CompanyService.delete_company_complete, db, company_id)
     if not success:
         raise HTTPException(
             status_code=404,
@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
+from itertools import chain
 
 from app.db.database import get_db
 from app.services.chat_service import ChatService
@@ -67,9 +68,14 @@ async def get_user_conversations(
     user_id: int,  # Now requires user_id as parameter
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor_updated_at: Optional[datetime] = Query(None, description="updated_at de la ultima conversacion recibida"),
+    cursor_id: Optional[int] = Query(None, description="id de la ultima conversacion recibida"),
     db: Session = Depends(get_db)
 ):
-    """Obtener todas las conversaciones del usuario - requiere user_id"""
+    """
+    Obtener todas las conversaciones del usuario - requiere user_id.
+    Para paginar, enviar cursor_updated_at + cursor_id de la ultima conversacion de la pagina anterior.
+    """
     try:
         # Get user from database
         current_user = AuthService.get_user_by_id(db, user_id)
@@ -79,7 +85,8 @@ async def get_user_conversations(
                 detail="Usuario no encontrado"
             )
         
-        conversations = chat_service.get_user_conversations(db, current_user, skip, limit)
+        cursor = (cursor_updated_at, cursor_id) if cursor_updated_at is not None and cursor_id is not None else None
+        conversations = chat_service.get_user_conversations(db, current_user, skip, limit, cursor=cursor)
         return conversations
         
     except Exception as e:
@@ -93,9 +100,16 @@ async def get_conversation_with_messages(
     session_id: str,
     user_id: int,  # Now requires user_id as parameter
     message_limit: int = Query(100, ge=1, le=500),
+    full_content: bool = Query(True, description="False devuelve solo un preview de cada mensaje"),
+    after: Optional[datetime] = Query(None, description="Cursor: timestamp del ultimo mensaje recibido"),
+    after_id: Optional[int] = Query(None, description="Cursor: id del ultimo mensaje recibido"),
     db: Session = Depends(get_db)
 ):
-    """Obtener conversacion completa con mensajes"""
+    """
+    Obtener conversacion completa con mensajes.
+    Para paginar, enviar after + after_id del ultimo mensaje recibido; sin after_id se incluyen
+    tambien los mensajes con ese mismo timestamp.
+    """
     try:
         # Get user from database
         current_user = AuthService.get_user_by_id(db, user_id)
@@ -106,7 +120,9 @@ async def get_conversation_with_messages(
             )
         
         conversation = chat_service.get_conversation_with_messages(
-            db, current_user, session_id, message_limit
+            db, current_user, session_id, message_limit,
+            full_content=full_content,
+            after=(after, after_id if after_id is not None else 0) if after is not None else None
         )
         
         if not conversation:
@@ -229,7 +245,7 @@ async def search_conversations(
         ).distinct().offset(skip).limit(limit).all()
         
         # Combinar resultados sin duplicados
-        all_conversations = {conv.id: conv for conv in title_matches + message_matches}
+        all_conversations = {conv.id: conv for conv in chain(title_matches, message_matches)}
         
         # Convertir a response con conteo de mensajes
         result = []
@@ -2,15 +2,21 @@
 Endpoints para configuracion avanzada de companias
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 from app.db.database import get_db
 from app.services.company_configuration_service import CompanyConfigurationService
 from app.services.document_processing_service import DocumentProcessingService
 from app.models.schemas import DocumentCategory
+import asyncio
 
-router = APIRouter(prefix="/company-config", tags=["company_configuration"])
+router = APIRouter(
+    prefix="/company-config",
+    tags=["company_configuration"],
+    default_response_class=ORJSONResponse
+)
 
 @router.get("/companies/{company_id}/full-configuration")
 async def get_full_company_configuration(
@@ -18,13 +24,13 @@ async def get_full_company_configuration(
     db: Session = Depends(get_db)
 ):
     """Obtener configuracion completa de una compania"""
-    config = CompanyConfigurationService.get_full_configuration(db, company_id)
-    if not config:
+    body = await CompanyConfigurationService.get_full_configuration_json(db, company_id)
+    if body is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Configuracion de compania no encontrada"
         )
-    return config
+    return Response(content=body, media_type="application/json")
 
 @router.post("/companies/{company_id}/initialize-ai")
 async def initialize_company_ai(
@@ -50,7 +56,9 @@ async def get_knowledge_summary(
     db: Session = Depends(get_db)
 ):
     """Obtener resumen del conocimiento procesado de una compania"""
-    summary = DocumentProcessingService.get_company_knowledge_summary(db, company_id)
+    summary = await asyncio.to_thread(
+        DocumentProcessingService.get_company_knowledge_summary, db, company_id
+    )
     return summary
 
 @router.get("/companies/{company_id}/ai-effectiveness")
@@ -59,7 +67,9 @@ async def get_ai_effectiveness_metrics(
     db: Session = Depends(get_db)
 ):
     """Obtener metricas de efectividad de la IA"""
-    metrics = CompanyConfigurationService.get_ai_effectiveness_metrics(db, company_id)
+    metrics = await asyncio.to_thread(
+        CompanyConfigurationService.get_ai_effectiveness_metrics, db, company_id
+    )
     return metrics
 
 @router.post("/companies/{company_id}/optimize-configuration")
@@ -80,7 +90,9 @@ async def get_document_categories_status(
     db: Session = Depends(get_db)
 ):
     """Obtener estado de documentos por categoria"""
-    status = CompanyConfigurationService.get_document_categories_status(db, company_id)
+    status = await asyncio.to_thread(
+        CompanyConfigurationService.get_document_categories_status, db, company_id
+    )
     return status
 
 @router.post("/companies/{company_id}/validate-setup")
@@ -89,7 +101,9 @@ async def validate_company_setup(
     db: Session = Depends(get_db)
 ):
     """Validar que la configuracion de la compania este completa"""
-    validation = CompanyConfigurationService.validate_company_setup(db, company_id)
+    validation = await asyncio.to_thread(
+        CompanyConfigurationService.validate_company_setup, db, company_id
+    )
     return validation
 
 @router.get("/my-company/configuration")
@@ -98,7 +112,9 @@ async def get_my_company_configuration(
     db: Session = Depends(get_db)
 ):
     """Obtener configuracion de la compania (requiere company_id)"""
-    config = CompanyConfigurationService.get_client_view_configuration(db, company_id)
+    config = await asyncio.to_thread(
+        CompanyConfigurationService.get_client_view_configuration, db, company_id
+    )
     return config
 
 @router.get("/my-company/ai-status")
@@ -107,5 +123,7 @@ async def get_my_company_ai_status(
     db: Session = Depends(get_db)
 ):
     """Obtener estado de la IA de la compania (requiere company_id)"""
-    status = CompanyConfigurationService.get_ai_status_for_client(db, company_id)
+    status = await asyncio.to_thread(
+        CompanyConfigurationService.get_ai_status_for_client, db, company_id
+    )
     return status
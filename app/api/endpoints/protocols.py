@@ -13,6 +13,7 @@ from app.models.protocol import Protocol
 from app.models.company import CompanyDocument
 from app.models.schemas import ProtocolCreate, ProtocolUpdate, ProtocolResponse
 from app.services.auth_service import AuthService
+from app.services.company_service import CompanyService
 
 logger = logging.getLogger(__name__)
 
@@ -138,6 +139,8 @@ async def update_protocol(
     
     db.commit()
     db.refresh(protocol)
+    # Las instrucciones cacheadas de cualquier compania pueden incluir este protocolo
+    CompanyService.invalidate_prompt_caches()
     
     # Contar uso
     usage_count = db.query(CompanyDocument).filter(
@@ -190,6 +193,7 @@ async def delete_protocol(
     
     db.delete(protocol)
     db.commit()
+    CompanyService.invalidate_prompt_caches()
     
     logger.info(f"[PROTOCOL] Protocol deleted: ID {protocol_id}")
     return {
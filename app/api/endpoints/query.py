@@ -17,12 +17,14 @@ from app.models.schemas import (
     ResponseLevel,
     ConceptualResponse,
     AccionalResponse,
-    ClarificationQuestion
+    ClarificationQuestion,
+    AmbiguityBatchRequest,
+    AmbiguityBatchResponse
 )
 from app.services.conversation_service import ConversationService
 from app.services.memory_service import MemoryService
 from app.services.chat_service import ChatService
-from app.db.database import get_db
+from app.db.database import get_db, session_scope
 from app.core.config import settings
 from app.models.user import User
 from app.models.conversation import Message
@@ -36,14 +38,22 @@ chat_service = ChatService()
 
 @router.post("/query/stream")
 async def process_query_stream(
-    request: QueryRequest, 
-    db: Session = Depends(get_db)
+    request: QueryRequest
 ):
     """
     Procesa una consulta con respuesta en streaming (Server-Sent Events)
     """
     
     async def generate_stream() -> AsyncGenerator[str, None]:
+        """
+        Una sola sesion para todo el stream (ruta y servicio).
+        No se usa Depends(get_db): la dependencia se cierra antes de enviar la respuesta.
+        """
+        with session_scope() as db:
+            async for event in stream_events(db):
+                yield event
+
+    async def stream_events(db: Session) -> AsyncGenerator[str, None]:
         """Generador para streaming de respuestas"""
         start_time = time.time()
         
@@ -105,11 +115,11 @@ async def process_query_stream(
             if has_previous_clarification or len(history) > 1:
                 is_ambiguous = False
             else:
-                is_ambiguous = await conversation_service.analyze_ambiguity(request.message)
+                is_ambiguous = await conversation_service.analyze_ambiguity(db, request.message)
             
             if is_ambiguous and not has_previous_clarification:
                 # Handle clarification (non-streaming for simplicity)
-                clarification_questions = await conversation_service.generate_clarification_questions(request.message)
+                clarification_questions = await conversation_service.generate_clarification_questions(db, request.message)
                 
                 clarification_data = {
                     'type': 'clarification',
@@ -126,7 +136,7 @@ async def process_query_stream(
                 # Stream the response
                 full_response = ""
                 async for chunk in conversation_service.generate_strategic_response_stream(
-                    request.message, session_id, current_user.id, 
+                    db, request.message, session_id, current_user.id, 
                     history_context=history,
                     require_analysis=request.require_analysis,
                     attachments=request.attachments  # Pass attachments
@@ -247,12 +257,12 @@ async def process_query(
             is_ambiguous = False
             print(f"[DEBUG] Skipping ambiguity analysis due to existing context")
         else:
-            is_ambiguous = await conversation_service.analyze_ambiguity(request.message)
+            is_ambiguous = await conversation_service.analyze_ambiguity(db, request.message)
             print(f"[DEBUG] Ambiguity analysis result: {is_ambiguous}")
         
         if is_ambiguous and not has_previous_clarification:
             # Solo una ronda de clarificacion permitida
-            clarification_questions = await conversation_service.generate_clarification_questions(request.message)
+            clarification_questions = await conversation_service.generate_clarification_questions(db, request.message)
             
             clarification_content = "[Solicitud de clarificacion]"
             clarification_metadata = {"type": "clarification", "questions": len(clarification_questions)}
@@ -272,32 +282,22 @@ async def process_query(
             print(f"[DEBUG] Generating strategic response with full context")
             if request.require_analysis:
                 # Generate structured analysis and action plan
+                # Una sola llamada devuelve analisis conceptual y plan de accion
                 try:
                     conceptual, accional = await conversation_service.generate_strategic_response(
-                        request.message, session_id, current_user.id, 
+                        db, request.message, session_id, current_user.id, 
                         history_context=history,
                         require_analysis=True,
                         attachments=request.attachments  # Pass attachments
                     )
-                    print(f"[OK] [DEBUG] Conceptual response generated with instructions")
+                    print(f"[OK] [DEBUG] Conceptual and accional responses generated with instructions")
                 except Exception as e:
-                    print(f"[ERR] [DEBUG] Error generating conceptual response: {e}")
+                    print(f"[ERR] [DEBUG] Error generating strategic response: {e}")
                     conceptual = ConceptualResponse(
                         content="Error generando respuesta conceptual. Intenta nuevamente.",
                         sources=[],
                         confidence=0.1
                     )
-
-                try:
-                    accional = await conversation_service.generate_strategic_response(
-                        request.message, session_id, current_user.id, 
-                        history_context=history,
-                        require_analysis=True,
-                        attachments=request.attachments  # Pass attachments
-                    )[1]  # Get accional from tuple
-                    print(f"[OK] [DEBUG] Accional response generated with instructions")
-                except Exception as e:
-                    print(f"[ERR] [DEBUG] Error generating accional response: {e}")
                     accional = AccionalResponse(
                         content="Error generando plan de accion. Intenta nuevamente.",
                         priority="media",
@@ -326,7 +326,7 @@ async def process_query(
             else:
                 try:
                     conceptual, accional = await conversation_service.generate_strategic_response(
-                        request.message, session_id, current_user.id, 
+                        db, request.message, session_id, current_user.id, 
                         history_context=history,
                         require_analysis=False,
                         attachments=request.attachments  # Pass attachments
@@ -513,6 +513,36 @@ async def clear_session(
         "timestamp": datetime.now()
     }
 
+@router.post("/query/ambiguity/batch", response_model=AmbiguityBatchResponse)
+async def submit_ambiguity_batch(
+    request: AmbiguityBatchRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Analisis de ambiguedad en lote via Batch API (cargas masivas, evaluaciones).
+    Las consultas interactivas siguen usando la API en vivo.
+    """
+    try:
+        batch = await conversation_service.submit_batch_ambiguity(db, request.messages, request.user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"[ERR] Error submitting ambiguity batch: {e}")
+        raise HTTPException(status_code=502, detail="No se pudo enviar el lote a OpenAI")
+
+    return AmbiguityBatchResponse(**batch)
+
+@router.get("/query/ambiguity/batch/{batch_id}", response_model=AmbiguityBatchResponse)
+async def get_ambiguity_batch(batch_id: str):
+    """
+    Estado del lote; con status "completed" incluye un resultado por mensaje
+    """
+    try:
+        return AmbiguityBatchResponse(**await conversation_service.get_batch_ambiguity_results(batch_id))
+    except Exception as e:
+        print(f"[ERR] Error retrieving ambiguity batch {batch_id}: {e}")
+        raise HTTPException(status_code=502, detail="No se pudo consultar el lote en OpenAI")
+
 @router.get("/query/memory/status")
 async def get_memory_status(
     user_id: int,  # Now requires user_id as parameter
@@ -18,6 +18,8 @@ class Settings:
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
+    # Nivel del logging de la aplicacion (DEBUG, INFO, WARNING, ERROR)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
 
     # =========================
     # Seguridad / Sesiones
@@ -69,6 +71,18 @@ class Settings:
     # =========================
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
 
+    # Pool de conexiones (ajustable por despliegue)
+    # pool_size + max_overflow = conexiones maximas por proceso worker
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    # Segundos esperando una conexion libre antes de fallar
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Reciclar conexiones antes de que el servidor/proxy las corte por inactividad
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # Con carga estricta, acceder a una relacion no precargada en los loaders
+    # batcheados lanza error en lugar de emitir una consulta lazy (detecta N+1)
+    STRICT_LOADING: bool = os.getenv("STRICT_LOADING", "false").lower() == "true"
+
     # =========================
     # Embeddings
     # =========================
@@ -101,6 +115,16 @@ class Settings:
     CONVERSATION_MEMORY_SIZE: int = int(
         os.getenv("CONVERSATION_MEMORY_SIZE", "10")
     )
+    # Cache semantico de respuestas (primer mensaje de cada conversacion).
+    # Desactivado por defecto: es local a cada proceso y la invalidacion por compania
+    # solo llega al worker que hizo la escritura, asi que el TTL acota la respuesta obsoleta
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    SEMANTIC_CACHE_TTL: int = int(
+        os.getenv("SEMANTIC_CACHE_TTL", "60")
+    )
+    SEMANTIC_CACHE_THRESHOLD: float = float(
+        os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")
+    )
     
     # =========================
     # OpenAI Response Settings
@@ -2,13 +2,22 @@
 Configuracion de base de datos PostgreSQL para memoria conversacional
 """
 
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, MetaData, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from contextlib import contextmanager
 
-# Crear engine de SQLAlchemy
-engine = create_engine(settings.DATABASE_URL)
+# Crear engine de SQLAlchemy (unico por proceso, compartido por todas las sesiones)
+# pool_pre_ping descarta conexiones caidas antes de entregarlas a una sesion
+engine = create_engine(
+    settings.DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=True
+)
 
 # Crear SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -18,12 +27,42 @@ Base = declarative_base()
 
 def get_db():
     """Dependency para obtener sesion de base de datos"""
+    with session_scope() as db:
+        yield db
+
+@contextmanager
+def session_scope():
+    """
+    Sesion de vida corta fuera del ciclo de una peticion (hilos, tareas de fondo).
+    Revierte la transaccion abierta si hay un error y siempre devuelve la conexion al pool.
+    """
     db = SessionLocal()
     try:
         yield db
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
 
+@contextmanager
+def count_queries(bind=None):
+    """
+    Registrar las sentencias SQL emitidas dentro del bloque (deteccion de N+1).
+    Uso: with count_queries() as statements: ...; len(statements)
+    """
+    target = bind if bind is not None else engine
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(target, "before_cursor_execute", before_cursor_execute)
+
 async def init_db():
     """Inicializar base de datos y crear tablas"""
     try:
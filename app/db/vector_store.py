@@ -29,8 +29,8 @@ class VectorStoreInterface(ABC):
         pass
     
     @abstractmethod
-    async def similarity_search(self, query: str, top_k: int = 5, company_id: int = None, project_id: int = None) -> List[Dict[str, Any]]:
-        """Busca chunks similares a una query"""
+    async def similarity_search(self, query: str, top_k: int = 5, company_id: int = None, project_id: int = None, query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """Busca chunks similares a una query (query_embedding evita volver a calcularlo)"""
         pass
     
     @abstractmethod
@@ -121,7 +121,7 @@ class PineconeVectorStore(VectorStoreInterface):
         print(f"[OK] Almacenados {len(chunks)} chunks en Pinecone")
         return chunk_ids
     
-    async def similarity_search(self, query: str, top_k: int = 5, company_id: int = None, project_id: int = None) -> List[Dict[str, Any]]:
+    async def similarity_search(self, query: str, top_k: int = 5, company_id: int = None, project_id: int = None, query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
         """Busqueda de similitud en Pinecone"""
         if not self.index:
             await self.initialize()
@@ -131,9 +131,9 @@ class PineconeVectorStore(VectorStoreInterface):
             self.text_processor = TextProcessor()
         
         try:
-            # Generate embedding for query
-            query_embeddings = await self.text_processor.generate_embeddings([query])
-            query_embedding = query_embeddings[0]
+            # Generate embedding for query (salvo que el llamador ya lo tenga)
+            if query_embedding is None:
+                query_embedding = (await self.text_processor.generate_embeddings([query]))[0]
             
             filter_dict = {}
             if project_id is not None:
@@ -272,7 +272,7 @@ class FAISSVectorStore(VectorStoreInterface):
         print(f"[OK] Almacenados {len(chunks)} chunks en FAISS")
         return chunk_ids
     
-    async def similarity_search(self, query: str, top_k: int = 5, company_id: int = None, project_id: int = None) -> List[Dict[str, Any]]:
+    async def similarity_search(self, query: str, top_k: int = 5, company_id: int = None, project_id: int = None, query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
         """Busqueda en FAISS"""
         if not self.index or self.index.ntotal == 0:
             print("[WARN] No hay documentos indexados para buscar")
@@ -282,9 +282,10 @@ class FAISSVectorStore(VectorStoreInterface):
             from app.utils.text_processor import TextProcessor
             self.text_processor = TextProcessor()
         
-        # Generate real embedding for the query
-        query_embeddings = await self.text_processor.generate_embeddings([query])
-        query_embedding = np.array([query_embeddings[0]], dtype=np.float32)
+        # Generate real embedding for the query (salvo que el llamador ya lo tenga)
+        if query_embedding is None:
+            query_embedding = (await self.text_processor.generate_embeddings([query]))[0]
+        query_embedding = np.array([query_embedding], dtype=np.float32)
         faiss.normalize_L2(query_embedding)
         
         scores, indices = self.index.search(query_embedding, min(top_k, self.index.ntotal))
@@ -392,9 +393,9 @@ class VectorStore:
         """Almacena chunks"""
         return await self.store.store_chunks(chunks, embeddings, metadata)
     
-    async def similarity_search(self, query: str, top_k: int = 5, company_id: int = None, project_id: int = None) -> List[Dict[str, Any]]:
+    async def similarity_search(self, query: str, top_k: int = 5, company_id: int = None, project_id: int = None, query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
         """Busqueda de similitud"""
-        return await self.store.similarity_search(query, top_k, company_id, project_id)
+        return await self.store.similarity_search(query, top_k, company_id, project_id, query_embedding)
     
     async def remove_by_metadata(self, metadata_filter: Dict[str, Any]) -> bool:
         """Elimina por metadatos"""
@@ -2,20 +2,34 @@
 Modelos de base de datos para companias y documentos
 """
 
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Computed, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
-from app.models.schemas import DocumentCategory
+from app.models.schemas import DocumentCategory, DocumentProcessingStatus
 import enum
 
+# Estados de procesamiento de documentos (ENUM nativo document_processing_status en PostgreSQL)
+STATUS_PENDING = DocumentProcessingStatus.PENDING.value
+STATUS_PROCESSING = DocumentProcessingStatus.PROCESSING.value
+STATUS_COMPLETED = DocumentProcessingStatus.COMPLETED.value
+STATUS_FAILED = DocumentProcessingStatus.FAILED.value
+PROCESSING_STATUSES = (STATUS_PENDING, STATUS_PROCESSING, STATUS_COMPLETED, STATUS_FAILED)
+# Estados finales (pertenencia O(1) en Python)
+TERMINAL_STATUSES = frozenset({STATUS_COMPLETED, STATUS_FAILED})
+# Estados cuyo contenido se usa como contexto; tupla para los filtros IN en SQL
+CONTENT_STATUSES = (STATUS_COMPLETED, STATUS_PENDING)
+
 class Company(Base):
     """Modelo de compania"""
     __tablename__ = "companies"
     
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String(255), nullable=False, index=True)
+    # Unico: find_or_create_company usa INSERT ... ON CONFLICT (name)
+    name = Column(String(255), nullable=False, unique=True, index=True)
     industry = Column(String(255), nullable=False)
+    # Industria normalizada (generada por la base de datos) para lookups sin .lower()
+    industry_key = Column(String(255), Computed("lower(btrim(industry))", persisted=True))
     sector = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
@@ -27,6 +41,14 @@ class Company(Base):
     documents = relationship("CompanyDocument", back_populates="company", cascade="all, delete-orphan")
     ai_configurations = relationship("AIConfiguration", back_populates="company", cascade="all, delete-orphan")
     projects = relationship("Project", back_populates="company", cascade="all, delete-orphan")
+    
+    # created_at e industry_key los genera la base: traerlos en el mismo INSERT ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
+    
+    # Mismo nombre que crea scripts/add_company_industry_key.sql
+    __table_args__ = (
+        Index("idx_companies_industry_key", industry_key),
+    )
 
 class CompanyDocument(Base):
     """Modelo de documento de compania"""
@@ -40,7 +62,11 @@ class CompanyDocument(Base):
     category = Column(SQLEnum(DocumentCategory), nullable=False, default=DocumentCategory.KNOWLEDGE_BASE)
     description = Column(Text, nullable=True)
     priority = Column(Integer, nullable=False, default=0)  # 1=highest, 5=lowest
-    processing_status = Column(String(50), nullable=False, default="pending")
+    processing_status = Column(
+        SQLEnum(*PROCESSING_STATUSES, name="document_processing_status"),
+        nullable=False,
+        default=STATUS_PENDING
+    )
     processed_chunks = Column(Integer, nullable=False, default=0)
     total_chunks = Column(Integer, nullable=False, default=0)
     error_message = Column(Text, nullable=True)
@@ -57,6 +83,19 @@ class CompanyDocument(Base):
     # Relaciones
     company = relationship("Company", back_populates="documents")
     protocol = relationship("Protocol", back_populates="company_documents")
+    
+    # uploaded_at lo genera la base: traerlo en el mismo INSERT ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
+    
+    __table_args__ = (
+        # Forma de los listados activos por categoria; INCLUDE permite index-only scans
+        Index(
+            "ix_doc_cmp_active_cat_prio", company_id, is_active, category, priority,
+            postgresql_include=["filename", "file_path"]
+        ),
+        # Conteos y filtros por estado de procesamiento
+        Index("ix_doc_cmp_status", company_id, processing_status),
+    )
 
 class AIConfiguration(Base):
     """Modelo de configuracion de IA por compania"""
@@ -2,8 +2,9 @@
 Modelos de base de datos para memoria conversacional
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON, Index, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from app.db.database import Base
 
@@ -22,14 +23,22 @@ class Conversation(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=True)
     title = Column(String(500), nullable=True)
+    # True mientras el titulo sea el generado automaticamente ("Chat dd/mm/YYYY HH:MM")
+    title_is_auto = Column(Boolean, default=False, server_default="false", nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     is_active = Column(Boolean, default=True)
     
     user = relationship("User", back_populates="conversations")
     project = relationship("Project", back_populates="conversations")
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
     shared_with = relationship("ConversationShare", back_populates="conversation", cascade="all, delete-orphan")
+    
+    # Indices para los patrones de acceso dominantes (ver scripts/add_conversation_indexes.sql)
+    __table_args__ = (
+        Index("idx_conversations_user_active_updated", user_id, is_active, updated_at.desc()),
+        Index("idx_conversations_user_active_created", user_id, is_active, created_at),
+    )
 
 class Message(Base):
     """Modelo para mensajes individuales"""
@@ -43,6 +52,13 @@ class Message(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     is_edited = Column(Boolean, default=False, nullable=False)
     message_metadata = Column(Text, nullable=True)  # JSON string para metadatos adicionales
+    # Vector de busqueda full-text generado por Postgres; diferido porque solo se usa en filtros
+    content_tsv = deferred(Column(TSVECTOR, Computed("to_tsvector('spanish', content)", persisted=True)))
     
     # Relacion con conversacion
     conversation = relationship("Conversation", back_populates="messages")
+    
+    __table_args__ = (
+        Index("idx_messages_conversation_timestamp", conversation_id, timestamp),
+        Index("idx_messages_content_tsv", content_tsv, postgresql_using="gin"),
+    )
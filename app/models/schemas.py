@@ -336,6 +336,18 @@ class QueryRequest(BaseModel):
     require_analysis: bool = Field(default=False, description="Si se requiere analisis conceptual y plan de accion estructurado")
     attachments: Optional[List[Dict[str, Any]]] = Field(default=None, description="Archivos adjuntos (imagenes o documentos procesados)")
 
+class AmbiguityBatchRequest(BaseModel):
+    """Request para analizar ambiguedad de muchos mensajes via Batch API (sin urgencia)"""
+    messages: List[str] = Field(min_length=1, max_length=50000)
+    user_id: int = Field(description="ID del usuario cuyas instrucciones de compania se aplican")
+
+class AmbiguityBatchResponse(BaseModel):
+    """Estado de un lote de analisis de ambiguedad"""
+    batch_id: str
+    status: str
+    # Un valor por mensaje en el orden enviado (None si ese mensaje fallo); solo al completar
+    results: Optional[List[Optional[bool]]] = None
+
 class ConceptualResponse(BaseModel):
     """Respuesta a nivel conceptual (por que)"""
     content: str = Field(description="Explicacion conceptual en Markdown")
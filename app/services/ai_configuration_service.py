@@ -3,9 +3,11 @@ Servicio para gestion de configuraciones de IA
 """
 
 from sqlalchemy.orm import Session
+from sqlalchemy import exists
 from typing import Optional, Dict, Any
 from app.models.company import AIConfiguration
 from app.models.schemas import AIConfigurationCreate, AIConfigurationUpdate
+from app.services.company_service import CompanyService
 import json
 
 class AIConfigurationService:
@@ -39,20 +41,57 @@ class AIConfigurationService:
         db.add(ai_config)
         db.commit()
         db.refresh(ai_config)
+        AIConfigurationService._config_cache(db)[config_data.company_id] = ai_config
+        CompanyService.invalidate_company_caches(db, config_data.company_id)
         return ai_config
     
+    @staticmethod
+    def _config_cache(db: Session) -> Dict[int, AIConfiguration]:
+        """Cache de configuraciones con alcance de peticion, guardado en Session.info"""
+        return db.info.setdefault("ai_config_cache", {})
+    
     @staticmethod
     def get_by_company_id(db: Session, company_id: int) -> Optional[AIConfiguration]:
-        """Obtener configuracion de IA por ID de compania"""
-        return db.query(AIConfiguration).filter(
+        """
+        Obtener configuracion de IA por ID de compania.
+        La configuracion encontrada se memoiza en la sesion (una por peticion),
+        asi las llamadas repetidas dentro de la misma peticion no vuelven a consultar.
+        """
+        cache = AIConfigurationService._config_cache(db)
+        if company_id in cache:
+            return cache[company_id]
+        
+        ai_config = db.query(AIConfiguration).filter(
             AIConfiguration.company_id == company_id,
             AIConfiguration.is_active == True
         ).first()
+        
+        if ai_config:
+            cache[company_id] = ai_config
+        return ai_config
     
     @staticmethod
-    def update_configuration(db: Session, company_id: int, config_update: AIConfigurationUpdate) -> Optional[AIConfiguration]:
-        """Actualizar configuracion de IA"""
-        ai_config = AIConfigurationService.get_by_company_id(db, company_id)
+    def has_configuration(db: Session, company_id: int) -> bool:
+        """Verificar si la compania tiene configuracion de IA sin cargar la fila completa"""
+        if company_id in AIConfigurationService._config_cache(db):
+            return True
+        return db.query(
+            exists().where(
+                AIConfiguration.company_id == company_id,
+                AIConfiguration.is_active == True
+            )
+        ).scalar()
+    
+    @staticmethod
+    def update_configuration(
+        db: Session,
+        company_id: int,
+        config_update: AIConfigurationUpdate,
+        ai_config: Optional[AIConfiguration] = None
+    ) -> Optional[AIConfiguration]:
+        """Actualizar configuracion de IA (ai_config permite reutilizar una instancia ya cargada)"""
+        if ai_config is None:
+            ai_config = AIConfigurationService.get_by_company_id(db, company_id)
         if not ai_config:
             return None
         
@@ -69,6 +108,7 @@ class AIConfigurationService:
         
         db.commit()
         db.refresh(ai_config)
+        CompanyService.invalidate_company_caches(db, company_id)
         return ai_config
     
     @staticmethod
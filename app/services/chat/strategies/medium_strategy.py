@@ -59,9 +59,9 @@ class MediumResponseStrategy(BaseResponseStrategy):
 
         # Stream Initial Response
         response_content = ""
-        stream = self.conversation_service.openai_client.chat.completions.create(**api_args)
+        stream = await self.conversation_service.openai_client.chat.completions.create(**api_args)
         
-        for chunk in stream:
+        async for chunk in stream:
             if chunk.choices and len(chunk.choices) > 0:
                 delta = chunk.choices[0].delta
                 if delta.content:
@@ -86,9 +86,9 @@ class MediumResponseStrategy(BaseResponseStrategy):
             messages.append({"role": "user", "content": extension_prompt})
             
             api_args["messages"] = messages
-            stream_extension = self.conversation_service.openai_client.chat.completions.create(**api_args)
+            stream_extension = await self.conversation_service.openai_client.chat.completions.create(**api_args)
             
-            for chunk in stream_extension:
+            async for chunk in stream_extension:
                 if chunk.choices and len(chunk.choices) > 0:
                     delta = chunk.choices[0].delta
                     if delta.content:
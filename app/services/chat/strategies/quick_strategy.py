@@ -58,9 +58,9 @@ class QuickResponseStrategy(BaseResponseStrategy):
         }
 
         # Stream Response
-        stream = self.conversation_service.openai_client.chat.completions.create(**api_args)
+        stream = await self.conversation_service.openai_client.chat.completions.create(**api_args)
         
-        for chunk in stream:
+        async for chunk in stream:
             if chunk.choices and len(chunk.choices) > 0:
                 delta = chunk.choices[0].delta
                 if delta.content:
@@ -3,15 +3,58 @@ Servicio optimizado para gestion de sesiones de chat con conciencia de contexto
 """
 
 from typing import List, Optional, Dict, Any, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func, and_, or_
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import desc, func, and_, or_, tuple_
 from datetime import datetime, timedelta
+import asyncio
+import threading
 import uuid
 
+from cachetools import TTLCache
+
 from app.models.user import User
 from app.models.conversation import Conversation, Message
 from app.models.schemas import ConversationCreate, ConversationResponse, ConversationWithMessages, MessageResponse
 from app.services.memory_service import MemoryService
+from app.db.database import session_scope
+
+# Formato de los titulos automaticos ("Chat dd/mm/YYYY HH:MM")
+DEFAULT_TITLE_FORMAT = "Chat %d/%m/%Y %H:%M"
+
+# Caracteres devueltos por mensaje cuando se pide solo un preview
+MESSAGE_PREVIEW_LENGTH = 500
+
+# Filas de mensajes leidas por lote al construir una conversacion completa
+MESSAGE_FETCH_BATCH_SIZE = 200
+
+# Cache de analiticas por proceso: user_id -> {days: analiticas}, 5 minutos de vida.
+# Crear/borrar conversaciones o agregar mensajes (tambien via MemoryService.add_message)
+# descarta la entrada del usuario. Con varios workers cada uno mantiene su propia cache.
+_analytics_cache: TTLCache = TTLCache(maxsize=1024, ttl=300)
+_analytics_lock = threading.Lock()
+
+
+def invalidate_conversation_analytics(user_id: int) -> None:
+    """Descartar las analiticas cacheadas de un usuario"""
+    with _analytics_lock:
+        _analytics_cache.pop(user_id, None)
+
+
+# Insights por industria, indexados por Company.industry_key (lower/trim de industry)
+_INDUSTRY_INSIGHTS: Dict[str, Tuple[str, ...]] = {
+    "tecnologia": (
+        "Considera el impacto en la escalabilidad tecnica",
+        "Evalua las implicaciones de seguridad y privacidad"
+    ),
+    "marketing": (
+        "Analiza el impacto en la experiencia del cliente",
+        "Considera las metricas de conversion y ROI"
+    ),
+    "finanzas": (
+        "Evalua el impacto financiero y el flujo de caja",
+        "Considera los riesgos regulatorios y de compliance"
+    )
+}
 
 class ChatService:
     """Servicio optimizado para gestion de chats con conciencia de contexto avanzada"""
@@ -32,8 +75,9 @@ class ChatService:
         
         # Crear titulo automatico si no se proporciona
         title = conversation_data.title
-        if not title:
-            title = f"Chat {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+        title_is_auto = not title
+        if title_is_auto:
+            title = datetime.now().strftime(DEFAULT_TITLE_FORMAT)
         
         # Crear conversacion con o sin proyecto
         db_conversation = Conversation(
@@ -41,12 +85,14 @@ class ChatService:
             user_id=user.id,
             project_id=conversation_data.project_id,  # Puede ser None
             title=title,
+            title_is_auto=title_is_auto,
             is_active=True
         )
         
         db.add(db_conversation)
         db.commit()
         db.refresh(db_conversation)
+        self._invalidate_analytics(user)
         
         return db_conversation
     
@@ -55,21 +101,36 @@ class ChatService:
         db: Session, 
         user: User, 
         skip: int = 0, 
-        limit: int = 50
+        limit: int = 50,
+        cursor: Optional[Tuple[datetime, int]] = None
     ) -> List[ConversationResponse]:
-        """Obtener todas las conversaciones de un usuario"""
-        
-        conversations = db.query(Conversation).filter(
+        """
+        Obtener todas las conversaciones de un usuario.
+        `cursor` es el (updated_at, id) de la ultima conversacion recibida: pagina por keyset
+        en lugar de OFFSET y tiene prioridad sobre `skip`.
+        """
+        
+        # Conversaciones con su conteo de mensajes en una sola consulta agregada
+        query = db.query(Conversation, func.count(Message.id)).outerjoin(
+            Message, Message.conversation_id == Conversation.id
+        ).filter(
             Conversation.user_id == user.id,
             Conversation.is_active == True
-        ).order_by(desc(Conversation.updated_at)).offset(skip).limit(limit).all()
+        )
         
-        # Convertir a response con conteo de mensajes
+        if cursor is not None:
+            query = query.filter(tuple_(Conversation.updated_at, Conversation.id) < tuple_(*cursor))
+        elif skip:
+            query = query.offset(skip)
+        
+        rows = query.group_by(Conversation.id).order_by(
+            desc(Conversation.updated_at), desc(Conversation.id)
+        ).limit(limit).all()
+        
+        # Convertir a response con conteo de mensajes (model_construct: datos del ORM, sin revalidar)
         result = []
-        for conv in conversations:
-            message_count = db.query(Message).filter(Message.conversation_id == conv.id).count()
-            
-            conv_response = ConversationResponse(
+        for conv, message_count in rows:
+            conv_response = ConversationResponse.model_construct(
                 id=conv.id,
                 session_id=conv.session_id,
                 user_id=conv.user_id,
@@ -90,22 +151,57 @@ class ChatService:
         user: User, 
         session_id: str
     ) -> Optional[Conversation]:
-        """Obtener conversacion por session_id verificando que pertenezca al usuario"""
+        """
+        Obtener conversacion por session_id verificando que pertenezca al usuario.
+        El resultado se memoiza en la sesion de base de datos (una por peticion),
+        asi las llamadas repetidas dentro de la misma peticion no vuelven a consultar.
+        """
+        
+        cache = self._conversation_cache(db)
+        cache_key = (user.id, session_id)
+        if cache_key in cache:
+            return cache[cache_key]
         
-        return db.query(Conversation).filter(
+        conversation = db.query(Conversation).filter(
             Conversation.session_id == session_id,
             Conversation.user_id == user.id,
             Conversation.is_active == True
         ).first()
+        
+        if conversation:
+            cache[cache_key] = conversation
+        return conversation
+    
+    @staticmethod
+    def _conversation_cache(db: Session) -> Dict[Tuple[int, str], Conversation]:
+        """Cache de conversaciones con alcance de peticion, guardado en Session.info"""
+        return db.info.setdefault("conversation_cache", {})
+    
+    def _invalidate_conversation_cache(self, db: Session, user: User, session_id: str):
+        """Descartar la conversacion memoizada tras modificarla"""
+        self._conversation_cache(db).pop((user.id, session_id), None)
+    
+    @staticmethod
+    def _invalidate_analytics(user: User):
+        """Invalidar las analiticas cacheadas del usuario"""
+        invalidate_conversation_analytics(user.id)
     
     def get_conversation_with_messages(
         self, 
         db: Session, 
         user: User, 
         session_id: str,
-        message_limit: int = 100
+        message_limit: int = 100,
+        full_content: bool = True,
+        after: Optional[Tuple[datetime, int]] = None
     ) -> Optional[ConversationWithMessages]:
-        """Obtener conversacion completa con sus mensajes"""
+        """
+        Obtener conversacion completa con sus mensajes.
+        Con full_content=False solo se cargan los primeros MESSAGE_PREVIEW_LENGTH caracteres de cada
+        mensaje (recortados en SQL). `after` es el (timestamp, id) del ultimo mensaje recibido: pagina
+        por keyset en lugar de OFFSET sin saltear mensajes con el mismo timestamp.
+        message_count es siempre el total de la conversacion, tambien al paginar.
+        """
         
         # Instead of using get_conversation_by_session_id which enforces ownership, we query directly
         conversation = db.query(Conversation).filter(
@@ -116,25 +212,54 @@ class ChatService:
         if not conversation:
             return None
         
-        # Obtener mensajes de la conversacion
-        messages = db.query(Message).filter(
-            Message.conversation_id == conversation.id
-        ).order_by(Message.timestamp).limit(message_limit).all()
+        # Obtener mensajes de la conversacion (content completo o solo un preview)
+        content_column = Message.content if full_content else func.substr(
+            Message.content, 1, MESSAGE_PREVIEW_LENGTH
+        ).label("content")
+        columns = [
+            Message.id,
+            Message.conversation_id,
+            Message.role,
+            content_column,
+            Message.timestamp,
+            Message.message_metadata
+        ]
+        message_count = 0
+        if after is None:
+            # Total real de mensajes (antes del LIMIT) en la misma consulta
+            columns.append(func.count().over().label("total_count"))
+        else:
+            # Con cursor la ventana solo veria los mensajes posteriores: contar el total aparte
+            message_count = db.query(func.count(Message.id)).filter(
+                Message.conversation_id == conversation.id
+            ).scalar()
+        
+        messages_query = db.query(*columns).filter(Message.conversation_id == conversation.id)
         
-        # Convertir mensajes a response
-        message_responses = [
-            MessageResponse(
+        if after is not None:
+            messages_query = messages_query.filter(tuple_(Message.timestamp, Message.id) > tuple_(*after))
+        
+        # yield_per trae las filas por lotes: solo un lote queda en memoria junto a las responses
+        messages = messages_query.order_by(Message.timestamp, Message.id).limit(message_limit).execution_options(
+            yield_per=MESSAGE_FETCH_BATCH_SIZE
+        )
+        
+        # Convertir mensajes a response a medida que se leen (model_construct: datos del ORM, sin revalidar)
+        message_responses = []
+        for msg in messages:
+            if after is None:
+                message_count = msg.total_count
+            message_responses.append(MessageResponse.model_construct(
                 id=msg.id,
                 conversation_id=msg.conversation_id,
                 role=msg.role,
                 content=msg.content,
                 timestamp=msg.timestamp,
                 message_metadata=msg.message_metadata
-            ) for msg in messages
-        ]
+            ))
         
         # Crear response completo
-        return ConversationWithMessages(
+        return ConversationWithMessages.model_construct(
             id=conversation.id,
             session_id=conversation.session_id,
             user_id=conversation.user_id,
@@ -143,7 +268,7 @@ class ChatService:
             created_at=conversation.created_at,
             updated_at=conversation.updated_at,
             is_active=conversation.is_active,
-            message_count=len(message_responses),
+            message_count=message_count,
             messages=message_responses
         )
     
@@ -152,19 +277,24 @@ class ChatService:
         db: Session, 
         user: User, 
         session_id: str, 
-        new_title: str
+        new_title: str,
+        commit: bool = True
     ) -> Optional[Conversation]:
-        """Actualizar titulo de conversacion"""
+        """Actualizar titulo de conversacion (con commit=False el llamador confirma la transaccion)"""
         
         conversation = self.get_conversation_by_session_id(db, user, session_id)
         if not conversation:
             return None
         
+        # updated_at lo asigna la base de datos (onupdate=func.now())
         conversation.title = new_title
-        conversation.updated_at = datetime.utcnow()
         
-        db.commit()
-        db.refresh(conversation)
+        if commit:
+            db.commit()
+            db.refresh(conversation)
+        else:
+            db.flush()
+        self._invalidate_conversation_cache(db, user, session_id)
         
         return conversation
     
@@ -174,16 +304,23 @@ class ChatService:
         user: User, 
         session_id: str
     ) -> bool:
-        """Eliminar conversacion (soft delete)"""
+        """Eliminar conversacion (soft delete) con un unico UPDATE filtrado por propietario"""
         
-        conversation = self.get_conversation_by_session_id(db, user, session_id)
-        if not conversation:
-            return False
+        updated = db.query(Conversation).filter(
+            Conversation.session_id == session_id,
+            Conversation.user_id == user.id,
+            Conversation.is_active == True
+        ).update(
+            {"is_active": False, "updated_at": func.now()},
+            synchronize_session=False
+        )
+        db.commit()
         
-        conversation.is_active = False
-        conversation.updated_at = datetime.utcnow()
+        self._invalidate_conversation_cache(db, user, session_id)
+        if not updated:
+            return False
         
-        db.commit()
+        self._invalidate_analytics(user)
         return True
     
     def add_message_to_conversation(
@@ -203,18 +340,15 @@ class ChatService:
         
         # Usar el memory service para agregar el mensaje
         try:
-            self.memory_service.add_message(db, session_id, role, content, metadata)
+            # add_message devuelve el mensaje recien creado, sin re-consultarlo; solo hace flush
+            message = self.memory_service.add_message(db, session_id, role, content, metadata, commit=False)
             
-            # Actualizar timestamp de la conversacion
-            conversation.updated_at = datetime.utcnow()
+            # Actualizar timestamp de la conversacion (NOW() del servidor) y confirmar todo en un unico commit
+            conversation.updated_at = func.now()
             db.commit()
+            self._invalidate_analytics(user)
             
-            # Obtener el mensaje recien creado
-            latest_message = db.query(Message).filter(
-                Message.conversation_id == conversation.id
-            ).order_by(desc(Message.timestamp)).first()
-            
-            return latest_message
+            return message
             
         except Exception as e:
             print(f"Error adding message to conversation: {e}")
@@ -246,8 +380,8 @@ class ChatService:
     ) -> str:
         """Generar titulo automatico basado en el primer mensaje"""
         
-        # Titulo simple basado en las primeras palabras
-        words = first_message.split()[:6]  # Primeras 6 palabras
+        # Titulo simple basado en las primeras 6 palabras; maxsplit evita partir el mensaje completo
+        words = first_message.split(None, 6)[:6]
         title = " ".join(words)
         
         # Limpiar y limitar longitud
@@ -256,7 +390,7 @@ class ChatService:
         
         # Si esta vacio, usar timestamp
         if not title.strip():
-            title = f"Chat {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+            title = datetime.now().strftime(DEFAULT_TITLE_FORMAT)
         
         return title
     
@@ -265,20 +399,34 @@ class ChatService:
         db: Session, 
         user: User, 
         session_id: str, 
-        first_message: str
+        first_message: str,
+        commit: bool = True
     ):
-        """Actualizar titulo de conversacion basado en el primer mensaje"""
+        """
+        Actualizar titulo de conversacion basado en el primer mensaje (commit=False: solo flush).
+        Solo aplica a titulos generados automaticamente; el filtro title_is_auto se evalua en el
+        propio UPDATE, sin leer la conversacion antes.
+        """
+        
+        new_title = self.generate_conversation_title(db, session_id, first_message)
+        updated = db.query(Conversation).filter(
+            Conversation.session_id == session_id,
+            Conversation.user_id == user.id,
+            Conversation.is_active == True,
+            Conversation.title_is_auto == True
+        ).update(
+            {"title": new_title, "title_is_auto": False, "updated_at": func.now()},
+            synchronize_session=False
+        )
         
-        conversation = self.get_conversation_by_session_id(db, user, session_id)
-        if not conversation:
+        if not updated:
             return
         
-        # Solo actualizar si el titulo es generico (contiene "Chat" y fecha)
-        if "Chat" in conversation.title and "/" in conversation.title:
-            new_title = self.generate_conversation_title(db, session_id, first_message)
-            conversation.title = new_title
-            conversation.updated_at = datetime.utcnow()
+        self._invalidate_conversation_cache(db, user, session_id)
+        if commit:
             db.commit()
+        else:
+            db.flush()
     
     def get_conversation_analytics(
         self, 
@@ -286,18 +434,46 @@ class ChatService:
         user: User,
         days: int = 30
     ) -> Dict[str, Any]:
-        """Obtener analisis detallado de conversaciones del usuario"""
+        """Obtener analisis detallado de conversaciones del usuario (cacheado por usuario y periodo)"""
+        
+        with _analytics_lock:
+            per_user = _analytics_cache.get(user.id)
+            if per_user is None:
+                per_user = _analytics_cache[user.id] = {}
+            cached = per_user.get(days)
+        if cached is not None:
+            return cached
+        
+        analytics = self._compute_conversation_analytics(db, user, days)
+        # Si se invalido mientras se calculaba, per_user ya no esta en la cache y esto se descarta
+        with _analytics_lock:
+            per_user[days] = analytics
+        return analytics
+    
+    def _compute_conversation_analytics(
+        self,
+        db: Session,
+        user: User,
+        days: int
+    ) -> Dict[str, Any]:
+        """Calcular las analiticas de conversaciones contra la base de datos"""
         
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         
-        # Conversaciones en el periodo
-        conversations = db.query(Conversation).filter(
+        period_filters = (
             Conversation.user_id == user.id,
             Conversation.is_active == True,
             Conversation.created_at >= cutoff_date
-        ).all()
+        )
+        
+        # Mensajes por conversacion en el periodo (una sola consulta agregada)
+        conversation_lengths = [
+            message_count for (message_count,) in db.query(func.count(Message.id)).select_from(Conversation).outerjoin(
+                Message, Message.conversation_id == Conversation.id
+            ).filter(*period_filters).group_by(Conversation.id).all()
+        ]
         
-        if not conversations:
+        if not conversation_lengths:
             return {
                 "period_days": days,
                 "total_conversations": 0,
@@ -307,23 +483,20 @@ class ChatService:
                 "most_active_hours": []
             }
         
-        # Mensajes por dia
-        daily_activity = {}
-        conversation_lengths = []
-        hourly_activity = [0] * 24
+        # Actividad por dia, agregada en SQL
+        created_day = func.date(Conversation.created_at)
+        daily_activity = {
+            day.isoformat(): count
+            for day, count in db.query(created_day, func.count(Conversation.id)).filter(
+                *period_filters
+            ).group_by(created_day).all()
+        }
         
-        for conv in conversations:
-            # Contar mensajes por conversacion
-            message_count = db.query(Message).filter(Message.conversation_id == conv.id).count()
-            conversation_lengths.append(message_count)
-            
-            # Actividad por dia
-            day_key = conv.created_at.date().isoformat()
-            daily_activity[day_key] = daily_activity.get(day_key, 0) + 1
-            
-            # Actividad por hora
-            hour = conv.created_at.hour
-            hourly_activity[hour] += 1
+        # Actividad por hora, agregada en SQL
+        created_hour = func.extract('hour', Conversation.created_at)
+        hourly_activity = db.query(created_hour, func.count(Conversation.id)).filter(
+            *period_filters
+        ).group_by(created_hour).order_by(created_hour).all()
         
         # Convertir daily_activity a lista ordenada
         daily_list = []
@@ -339,23 +512,34 @@ class ChatService:
             current_date += timedelta(days=1)
         
         # Horas mas activas
-        most_active_hours = []
-        for hour, count in enumerate(hourly_activity):
-            if count > 0:
-                most_active_hours.append({"hour": hour, "conversations": count})
+        most_active_hours = [
+            {"hour": int(hour), "conversations": count} for hour, count in hourly_activity
+        ]
         
         most_active_hours.sort(key=lambda x: x["conversations"], reverse=True)
         
+        # Total, minimo y maximo en una sola pasada
+        total_conversations = len(conversation_lengths)
+        total_messages = 0
+        min_length = max_length = conversation_lengths[0]
+        for length in conversation_lengths:
+            total_messages += length
+            if length < min_length:
+                min_length = length
+            elif length > max_length:
+                max_length = length
+        average_length = round(total_messages / total_conversations, 2)
+        
         return {
             "period_days": days,
-            "total_conversations": len(conversations),
-            "total_messages": sum(conversation_lengths),
-            "average_messages_per_conversation": round(sum(conversation_lengths) / len(conversations), 2) if conversations else 0,
+            "total_conversations": total_conversations,
+            "total_messages": total_messages,
+            "average_messages_per_conversation": average_length,
             "daily_activity": daily_list,
             "conversation_lengths": {
-                "min": min(conversation_lengths) if conversation_lengths else 0,
-                "max": max(conversation_lengths) if conversation_lengths else 0,
-                "average": round(sum(conversation_lengths) / len(conversation_lengths), 2) if conversation_lengths else 0
+                "min": min_length,
+                "max": max_length,
+                "average": average_length
             },
             "most_active_hours": most_active_hours[:5]  # Top 5 horas
         }
@@ -369,19 +553,28 @@ class ChatService:
     ) -> List[Tuple[MessageResponse, ConversationResponse]]:
         """Buscar mensajes especificos en todas las conversaciones del usuario"""
         
-        # Buscar mensajes que contengan el query
-        messages = db.query(Message).join(Conversation).filter(
+        # Buscar mensajes que contengan el query: full-text (indice GIN) salvo para queries muy cortas,
+        # donde el stemming no aplica y se mantiene ILIKE
+        if len(query.strip()) < 3:
+            match_filter = Message.content.ilike(f"%{query}%")
+        else:
+            match_filter = Message.content_tsv.op('@@')(func.plainto_tsquery('spanish', query))
+        
+        # contains_eager hidrata message.conversation desde el mismo JOIN (sin lazy load por fila)
+        messages = db.query(Message).join(Conversation).options(
+            contains_eager(Message.conversation)
+        ).filter(
             Conversation.user_id == user.id,
             Conversation.is_active == True,
-            Message.content.ilike(f"%{query}%")
+            match_filter
         ).order_by(desc(Message.timestamp)).limit(limit).all()
         
-        # Crear respuestas con informacion de conversacion
+        # Crear respuestas con informacion de conversacion (model_construct: datos del ORM, sin revalidar)
         results = []
         for message in messages:
             conversation = message.conversation
             
-            message_response = MessageResponse(
+            message_response = MessageResponse.model_construct(
                 id=message.id,
                 conversation_id=message.conversation_id,
                 role=message.role,
@@ -390,7 +583,7 @@ class ChatService:
                 message_metadata=message.message_metadata
             )
             
-            conversation_response = ConversationResponse(
+            conversation_response = ConversationResponse.model_construct(
                 id=conversation.id,
                 session_id=conversation.session_id,
                 user_id=conversation.user_id,
@@ -423,13 +616,28 @@ class ChatService:
             Message.conversation_id == conversation.id
         ).order_by(Message.timestamp).all()
         
+        return self._summarize_conversation(db, user, conversation, messages)
+    
+    def _summarize_conversation(
+        self,
+        db: Session,
+        user: User,
+        conversation: Conversation,
+        messages: List[Message],
+        company_context: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Construir el resumen contextual a partir de mensajes ya cargados"""
+        
         if not messages:
             return {}
         
+        if company_context is None:
+            company_context = self._extract_company_context(db, user, messages)
+        
         # Extraer informacion contextual clave
         context_summary = {
             "conversation_id": conversation.id,
-            "session_id": session_id,
+            "session_id": conversation.session_id,
             "project_id": conversation.project_id,  # Incluir project_id en el resumen
             "total_messages": len(messages),
             "duration_minutes": self._calculate_conversation_duration(messages),
@@ -438,7 +646,7 @@ class ChatService:
             "conversation_flow": self._analyze_conversation_flow(messages),
             "key_decisions": self._extract_key_decisions(messages),
             "unresolved_questions": self._find_unresolved_questions(messages),
-            "company_context": self._extract_company_context(db, user, messages)
+            "company_context": company_context
         }
         
         return context_summary
@@ -470,8 +678,21 @@ class ChatService:
             "historical_decisions": []
         }
         
+        # Cargar los mensajes de todas las conversaciones en una sola consulta IN
+        messages_by_conversation: Dict[int, List[Message]] = {conv.id: [] for conv in recent_conversations}
+        if messages_by_conversation:
+            for message in db.query(Message).filter(
+                Message.conversation_id.in_(messages_by_conversation.keys())
+            ).order_by(Message.timestamp).all():
+                messages_by_conversation[message.conversation_id].append(message)
+        
+        # El contexto de compania es el mismo para todas las conversaciones del usuario
+        company_context = self._extract_company_context(db, user, []) if recent_conversations else {}
+        
         for conv in recent_conversations:
-            conv_summary = self.get_contextual_conversation_summary(db, user, conv.session_id)
+            conv_summary = self._summarize_conversation(
+                db, user, conv, messages_by_conversation[conv.id], company_context
+            )
             if conv_summary:
                 cross_context["recent_conversations"].append({
                     "session_id": conv.session_id,
@@ -487,14 +708,20 @@ class ChatService:
         
         return cross_context
     
-    def get_intelligent_conversation_suggestions(
+    async def get_intelligent_conversation_suggestions(
         self, 
         db: Session, 
         user: User, 
         current_message: str,
         session_id: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Generar sugerencias inteligentes basadas en el contexto del usuario"""
+        """
+        Generar sugerencias inteligentes basadas en el contexto del usuario.
+        Las tres lecturas de contexto son independientes y se ejecutan en paralelo;
+        cada una corre en su propio hilo con su propia sesion (las sesiones no son thread-safe).
+        A los hilos solo se pasan ids: la instancia `user` queda ligada a `db` y no se toca
+        fuera del hilo de la peticion.
+        """
         
         suggestions = {
             "follow_up_questions": [],
@@ -504,14 +731,23 @@ class ChatService:
             "action_items": []
         }
         
-        # Obtener contexto de la conversacion actual
+        async def _none() -> None:
+            return None
+        
+        user_id, company_id = user.id, user.company_id
+        
+        current_context, cross_context, company_insights = await asyncio.gather(
+            # Contexto de la conversacion actual
+            self._run_for_user_in_own_session(self.get_contextual_conversation_summary, user_id, session_id) if session_id else _none(),
+            # Contexto de conversaciones anteriores
+            self._run_for_user_in_own_session(self.get_cross_conversation_context, user_id, session_id or ""),
+            # Sugerencias especificas de la compania
+            self._run_in_own_session(self._generate_company_insights, company_id, current_message) if company_id else _none()
+        )
+        
         if session_id:
-            current_context = self.get_contextual_conversation_summary(db, user, session_id)
             suggestions["current_context"] = current_context
         
-        # Obtener contexto de conversaciones anteriores
-        cross_context = self.get_cross_conversation_context(db, user, session_id or "")
-        
         # Generar sugerencias basadas en patrones historicos
         suggestions["follow_up_questions"] = self._generate_contextual_follow_ups(
             current_message, cross_context
@@ -525,14 +761,31 @@ class ChatService:
             current_message, cross_context["recent_conversations"]
         )
         
-        # Sugerencias especificas de la compania
-        if user.company_id:
-            suggestions["company_specific_insights"] = self._generate_company_insights(
-                db, user.company_id, current_message
-            )
+        if company_insights is not None:
+            suggestions["company_specific_insights"] = company_insights
         
         return suggestions
     
+    @staticmethod
+    async def _run_in_own_session(func, *args):
+        """Ejecutar una funcion sincrona de base de datos en un hilo con una sesion dedicada"""
+        
+        def _call():
+            with session_scope() as session:
+                return func(session, *args)
+        
+        return await asyncio.to_thread(_call)
+    
+    @staticmethod
+    async def _run_for_user_in_own_session(func, user_id: int, *args):
+        """Como _run_in_own_session, pero cargando el usuario por id en la sesion del hilo"""
+        
+        def _call():
+            with session_scope() as session:
+                return func(session, session.get(User, user_id), *args)
+        
+        return await asyncio.to_thread(_call)
+    
     def update_conversation_context_metadata(
         self, 
         db: Session, 
@@ -799,25 +1052,8 @@ class ChatService:
             company = CompanyService.get_company_by_id(db, company_id)
             
             if company:
-                # Insights basados en la industria
-                industry_insights = {
-                    "tecnologia": [
-                        "Considera el impacto en la escalabilidad tecnica",
-                        "Evalua las implicaciones de seguridad y privacidad"
-                    ],
-                    "marketing": [
-                        "Analiza el impacto en la experiencia del cliente",
-                        "Considera las metricas de conversion y ROI"
-                    ],
-                    "finanzas": [
-                        "Evalua el impacto financiero y el flujo de caja",
-                        "Considera los riesgos regulatorios y de compliance"
-                    ]
-                }
-                
-                industry_key = company.industry.lower()
-                if industry_key in industry_insights:
-                    insights.extend(industry_insights[industry_key])
+                # Insights basados en la industria (industry_key ya viene normalizada)
+                insights.extend(_INDUSTRY_INSIGHTS.get(company.industry_key, ()))
         
         except Exception as e:
             print(f"Error generating company insights: {e}")
@@ -850,11 +1086,10 @@ class ChatService:
         # Actualizar el mensaje
         message.content = new_content
         message.is_edited = True
-        message.updated_at = datetime.utcnow()
         
         # Actualizar timestamp de la conversacion
         conversation = message.conversation
-        conversation.updated_at = datetime.utcnow()
+        conversation.updated_at = func.now()
         
         db.commit()
         db.refresh(message)
@@ -885,7 +1120,7 @@ class ChatService:
         
         # Actualizar timestamp de la conversacion antes de eliminar
         conversation = message.conversation
-        conversation.updated_at = datetime.utcnow()
+        conversation.updated_at = func.now()
         
         # Eliminar el mensaje
         db.delete(message)
@@ -3,37 +3,281 @@ Servicio para configuracion avanzada de companias
 """
 
 from sqlalchemy.orm import Session
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
-from app.services.company_service import CompanyService, CompanyDocumentService
+from sqlalchemy import func, and_
+import asyncio
+from dataclasses import dataclass
+from collections import Counter
+from operator import attrgetter
+from types import MappingProxyType
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from app.services.company_service import (
+    CompanyService, CompanyDocumentService, client_view_cache, company_cache_lock, full_config_cache
+)
 from app.services.ai_configuration_service import AIConfigurationService
 from app.models.schemas import DocumentCategory, AIConfigurationCreate
-from app.models.company import Company, CompanyDocument, AIConfiguration
-import json
+from app.models.company import (
+    Company, CompanyDocument, AIConfiguration, STATUS_PENDING, STATUS_COMPLETED, STATUS_FAILED
+)
+import orjson
+
+# Configuracion de IA por defecto segun industria (solo lectura)
+_INDUSTRY_CONFIGS = MappingProxyType({
+    "tecnologia": MappingProxyType({
+        "response_style": "technical",
+        "temperature": "0.7",
+        "methodology_prompt": "Eres un consultor estrategico especializado en tecnologia y software. Proporciona analisis tecnicos profundos y recomendaciones basadas en mejores practicas de la industria tech."
+    }),
+    "marketing": MappingProxyType({
+        "response_style": "creative",
+        "temperature": "0.8",
+        "methodology_prompt": "Eres un estratega de marketing digital experto. Enfocate en estrategias de crecimiento, branding y optimizacion de conversiones."
+    }),
+    "finanzas": MappingProxyType({
+        "response_style": "analytical",
+        "temperature": "0.6",
+        "methodology_prompt": "Eres un consultor financiero estrategico. Proporciona analisis rigurosos basados en datos y metricas financieras."
+    }),
+    "salud": MappingProxyType({
+        "response_style": "professional",
+        "temperature": "0.6",
+        "methodology_prompt": "Eres un consultor estrategico especializado en el sector salud. Considera regulaciones, etica y impacto social en tus recomendaciones."
+    })
+})
+
+# Industria usada cuando la de la compania no tiene configuracion propia
+_DEFAULT_INDUSTRY_KEY = "tecnologia"
+
+# Parametros comunes a todas las industrias
+_DEFAULT_AI_KWARGS = MappingProxyType({
+    "model_name": "gpt-4",
+    "max_tokens": 2000,
+    "instruction_priority": "high",
+    "knowledge_base_priority": "high",
+    "fallback_to_general": True
+})
+
+# Campos del resumen de documento; attrgetter los lee todos en una sola llamada
+_DOC_FIELDS = ("id", "filename", "priority", "processing_status", "description", "uploaded_at")
+_DOC_GETTER = attrgetter(*_DOC_FIELDS)
+
+def _serialize_document(doc: CompanyDocument) -> Dict[str, Any]:
+    """Representacion resumida de un documento para la configuracion completa"""
+    data = dict(zip(_DOC_FIELDS, _DOC_GETTER(doc)))
+    uploaded_at = data["uploaded_at"]
+    data["uploaded_at"] = uploaded_at.isoformat() if uploaded_at else None
+    return data
+
+# Bloque ai_configuration para companias sin configuracion de IA.
+# Compartido entre respuestas: dict plano (orjson no serializa mappingproxy), no modificar.
+_AI_CFG_NONE = {
+    "configured": False,
+    "model_name": None,
+    "response_style": None,
+    "instruction_priority": None,
+    "knowledge_base_priority": None,
+    "fallback_to_general": None
+}
+
+# Metricas simuladas de efectividad (solo lectura, compartidas entre llamadas)
+_FAKE_METRICS = MappingProxyType({
+    "response_quality": MappingProxyType({
+        "average_confidence": 0.85,
+        "source_utilization": 0.92,
+        "instruction_compliance": 0.88
+    }),
+    "usage_statistics": MappingProxyType({
+        "total_queries": 156,
+        "successful_responses": 148,
+        "clarification_requests": 8,
+        "average_response_time": 2.3
+    }),
+    "knowledge_base_effectiveness": MappingProxyType({
+        "knowledge_docs_used": 12,
+        "instruction_docs_used": 5,
+        "fallback_to_general": 15
+    }),
+    "user_satisfaction": MappingProxyType({
+        "positive_feedback": 0.91,
+        "completion_rate": 0.94,
+        "return_users": 0.78
+    })
+})
+
+# Plantilla de AIConfigurationCreate por industria, construida una vez al importar.
+# Por llamada solo se copia la plantilla con el company_id correspondiente.
+_AI_CONFIG_TEMPLATES: Dict[str, AIConfigurationCreate] = {
+    industry_key: AIConfigurationCreate(
+        company_id=0,
+        methodology_prompt=config["methodology_prompt"],
+        response_style=config["response_style"],
+        temperature=config["temperature"],
+        **_DEFAULT_AI_KWARGS
+    )
+    for industry_key, config in _INDUSTRY_CONFIGS.items()
+}
+
+# Reglas de optimizacion: (ruta en los datos, umbral, sugerencia, valor).
+# Umbral None significa que basta con que el valor sea verdadero.
+_FEEDBACK_RULES = (
+    # Analizar temperatura basada en feedback
+    (("response_feedback", "too_creative"), 0.3, "adjust_temperature", 0.6),
+    (("response_feedback", "too_rigid"), 0.3, "adjust_temperature", 0.8),
+    # Analizar uso de fuentes
+    (("source_usage", "knowledge_base_low"), None, "adjust_priorities", MappingProxyType({
+        "knowledge_base_priority": "very_high",
+        "instruction_priority": "high"
+    })),
+    # Sugerir mejoras en documentacion
+    (("clarification_rate",), 0.2, "improve_documentation", MappingProxyType({
+        "add_more_instructions": True,
+        "clarify_knowledge_base": True
+    })),
+)
+
+def _walk(data: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    """Recorrer diccionarios anidados; None si falta algun nivel"""
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+# Reglas de validacion de la configuracion. Cada regla recibe la fila de
+# _load_setup_counts y retorna (puntaje, issue, warning).
+def _rule_description(counts) -> Tuple[int, Optional[str], Optional[str]]:
+    if not counts.description:
+        return 0, None, "Falta descripcion de la compania"
+    return 10, None, None
+
+def _rule_knowledge_docs(counts) -> Tuple[int, Optional[str], Optional[str]]:
+    if counts.knowledge_count == 0:
+        return 0, "No hay documentos de fuentes de conocimiento", None
+    if counts.knowledge_count < 3:
+        return 15, None, "Se recomienda tener al menos 3 documentos de conocimiento"
+    return 25, None, None
+
+def _rule_instruction_docs(counts) -> Tuple[int, Optional[str], Optional[str]]:
+    if counts.instruction_count == 0:
+        return 0, "No hay documentos de instrucciones", None
+    return 20, None, None
+
+def _rule_ai_config(counts) -> Tuple[int, Optional[str], Optional[str]]:
+    if counts.ai_config_id is None:
+        return 0, "No hay configuracion de IA", None
+    if not counts.methodology_prompt:
+        return 25, None, "Falta prompt de metodologia personalizada"
+    return 35, None, None
+
+def _rule_processing_rate(counts) -> Tuple[int, Optional[str], Optional[str]]:
+    total_docs = counts.knowledge_count + counts.instruction_count
+    if total_docs == 0:
+        return 0, None, None
+    processing_rate = counts.processed_count / total_docs
+    if processing_rate < 0.8:
+        return 0, None, f"Solo {processing_rate:.0%} de los documentos estan procesados"
+    return 10, None, None
+
+_VALIDATION_RULES = (
+    _rule_description,
+    _rule_knowledge_docs,
+    _rule_instruction_docs,
+    _rule_ai_config,
+    _rule_processing_rate,
+)
+
+def _iter_json(value: Any) -> Iterator[bytes]:
+    """Codificar un payload JSON por partes; los iteradores se consumen de a un elemento"""
+    if isinstance(value, dict):
+        yield b"{"
+        for index, (key, item) in enumerate(value.items()):
+            if index:
+                yield b","
+            yield orjson.dumps(key)
+            yield b":"
+            yield from _iter_json(item)
+        yield b"}"
+    elif isinstance(value, (list, tuple, map)):
+        yield b"["
+        for index, item in enumerate(value):
+            if index:
+                yield b","
+            yield orjson.dumps(item)
+        yield b"]"
+    else:
+        # orjson serializa datetimes de forma nativa
+        yield orjson.dumps(value)
+
+@dataclass(slots=True)
+class ConfigSnapshot:
+    """Compania con sus documentos activos y configuracion de IA, cargados una sola vez"""
+    company: Company
+    knowledge_docs: List[CompanyDocument]
+    instruction_docs: List[CompanyDocument]
+    ai_config: Optional[AIConfiguration]
+    documents: List[CompanyDocument]
 
 class CompanyConfigurationService:
     """Servicio para configuracion avanzada y gestion integral de companias"""
     
     @staticmethod
-    def get_full_configuration(db: Session, company_id: int) -> Optional[Dict[str, Any]]:
-        """Obtener configuracion completa de una compania"""
-        company = CompanyService.get_company_by_id(db, company_id)
+    def _load_snapshot(db: Session, company_id: int) -> Optional[ConfigSnapshot]:
+        """
+        Cargar compania, documentos activos y configuracion de IA en un solo viaje.
+        Retorna None si la compania no existe.
+        """
+        company = CompanyService.get_company_with_related(db, company_id)
+        
         if not company:
             return None
         
-        # Obtener documentos por categoria
-        knowledge_docs = CompanyDocumentService.get_company_documents(
-            db, company_id, DocumentCategory.KNOWLEDGE_BASE
+        # Mismo orden que get_company_documents: prioridad asc, uploaded_at desc
+        documents = sorted(
+            company.documents,
+            key=lambda d: d.uploaded_at.timestamp() if d.uploaded_at else 0.0,
+            reverse=True
         )
-        instruction_docs = CompanyDocumentService.get_company_documents(
-            db, company_id, DocumentCategory.INSTRUCTIONS
+        documents.sort(key=lambda d: d.priority)
+        
+        # Particionar por categoria en memoria en lugar de una consulta por categoria
+        knowledge_docs = []
+        instruction_docs = []
+        for doc in documents:
+            if doc.category == DocumentCategory.KNOWLEDGE_BASE:
+                knowledge_docs.append(doc)
+            elif doc.category == DocumentCategory.INSTRUCTIONS:
+                instruction_docs.append(doc)
+        
+        ai_config = company.ai_configurations[0] if company.ai_configurations else None
+        
+        return ConfigSnapshot(company, knowledge_docs, instruction_docs, ai_config, documents)
+    
+    @staticmethod
+    async def get_full_configuration(
+        db: Session,
+        company_id: int,
+        lazy_documents: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Obtener configuracion completa de una compania.
+        Con lazy_documents=True las listas de documentos se retornan como iteradores
+        para serializarlas de a un documento (respuesta en streaming).
+        """
+        # La carga es sincrona: ejecutarla fuera del event loop
+        snapshot = await asyncio.to_thread(
+            CompanyConfigurationService._load_snapshot, db, company_id
         )
+        if not snapshot:
+            return None
         
-        # Obtener configuracion de IA
-        ai_config = AIConfigurationService.get_by_company_id(db, company_id)
+        company = snapshot.company
+        knowledge_docs = snapshot.knowledge_docs
+        instruction_docs = snapshot.instruction_docs
+        ai_config = snapshot.ai_config
         
-        # Obtener estadisticas de procesamiento
-        processing_summary = CompanyDocumentService.get_processing_summary(db, company_id)
+        # Estadisticas de procesamiento a partir de los documentos ya cargados
+        processing_summary = CompanyDocumentService.build_processing_summary(snapshot.documents)
+        
+        serialize = map if lazy_documents else (lambda f, docs: [f(doc) for doc in docs])
         
         return {
             "company": {
@@ -43,50 +287,53 @@ class CompanyConfigurationService:
                 "sector": company.sector,
                 "description": company.description,
                 "is_active": company.is_active,
-                "created_at": company.created_at
+                "created_at": company.created_at.isoformat() if company.created_at else None
             },
             "documents": {
                 "knowledge_base": {
                     "count": len(knowledge_docs),
-                    "documents": [
-                        {
-                            "id": doc.id,
-                            "filename": doc.filename,
-                            "priority": doc.priority,
-                            "processing_status": doc.processing_status,
-                            "description": doc.description,
-                            "uploaded_at": doc.uploaded_at
-                        } for doc in knowledge_docs
-                    ]
+                    "documents": serialize(_serialize_document, knowledge_docs)
                 },
                 "instructions": {
                     "count": len(instruction_docs),
-                    "documents": [
-                        {
-                            "id": doc.id,
-                            "filename": doc.filename,
-                            "priority": doc.priority,
-                            "processing_status": doc.processing_status,
-                            "description": doc.description,
-                            "uploaded_at": doc.uploaded_at
-                        } for doc in instruction_docs
-                    ]
+                    "documents": serialize(_serialize_document, instruction_docs)
                 }
             },
-            "ai_configuration": {
-                "configured": ai_config is not None,
-                "model_name": ai_config.model_name if ai_config else None,
-                "response_style": ai_config.response_style if ai_config else None,
-                "instruction_priority": ai_config.instruction_priority if ai_config else None,
-                "knowledge_base_priority": ai_config.knowledge_base_priority if ai_config else None,
-                "fallback_to_general": ai_config.fallback_to_general if ai_config else None
+            "ai_configuration": _AI_CFG_NONE if ai_config is None else {
+                "configured": True,
+                "model_name": ai_config.model_name,
+                "response_style": ai_config.response_style,
+                "instruction_priority": ai_config.instruction_priority,
+                "knowledge_base_priority": ai_config.knowledge_base_priority,
+                "fallback_to_general": ai_config.fallback_to_general
             },
             "processing_summary": processing_summary,
-            "setup_status": CompanyConfigurationService._calculate_setup_status(
-                company, knowledge_docs, instruction_docs, ai_config
-            )
+            "setup_status": CompanyConfigurationService._calculate_setup_status(snapshot)
         }
     
+    @staticmethod
+    async def get_full_configuration_json(db: Session, company_id: int) -> Optional[bytes]:
+        """
+        Configuracion completa ya serializada a JSON, cacheada por compania.
+        La cache se invalida en cada escritura de compania, documentos o configuracion de IA.
+        """
+        with company_cache_lock:
+            cached = full_config_cache.get(company_id)
+        if cached is not None:
+            return cached
+        
+        config = await CompanyConfigurationService.get_full_configuration(
+            db, company_id, lazy_documents=True
+        )
+        if not config:
+            return None
+        
+        # Cada documento se serializa y libera antes de pasar al siguiente
+        body = b"".join(_iter_json(config))
+        with company_cache_lock:
+            full_config_cache[company_id] = body
+        return body
+    
     @staticmethod
     async def initialize_ai_configuration(db: Session, company_id: int) -> Dict[str, Any]:
         """Inicializar configuracion de IA con valores por defecto inteligentes"""
@@ -115,43 +362,9 @@ class CompanyConfigurationService:
     @staticmethod
     def _generate_default_ai_config(company: Company) -> AIConfigurationCreate:
         """Generar configuracion de IA por defecto basada en la industria"""
-        industry_configs = {
-            "tecnologia": {
-                "response_style": "technical",
-                "temperature": "0.7",
-                "methodology_prompt": "Eres un consultor estrategico especializado en tecnologia y software. Proporciona analisis tecnicos profundos y recomendaciones basadas en mejores practicas de la industria tech."
-            },
-            "marketing": {
-                "response_style": "creative",
-                "temperature": "0.8",
-                "methodology_prompt": "Eres un estratega de marketing digital experto. Enfocate en estrategias de crecimiento, branding y optimizacion de conversiones."
-            },
-            "finanzas": {
-                "response_style": "analytical",
-                "temperature": "0.6",
-                "methodology_prompt": "Eres un consultor financiero estrategico. Proporciona analisis rigurosos basados en datos y metricas financieras."
-            },
-            "salud": {
-                "response_style": "professional",
-                "temperature": "0.6",
-                "methodology_prompt": "Eres un consultor estrategico especializado en el sector salud. Considera regulaciones, etica y impacto social en tus recomendaciones."
-            }
-        }
-        
-        industry_key = company.industry.lower()
-        config = industry_configs.get(industry_key, industry_configs["tecnologia"])
-        
-        return AIConfigurationCreate(
-            company_id=company.id,
-            methodology_prompt=config["methodology_prompt"],
-            response_style=config["response_style"],
-            model_name="gpt-4",
-            temperature=config["temperature"],
-            max_tokens=2000,
-            instruction_priority="high",
-            knowledge_base_priority="high",
-            fallback_to_general=True
-        )
+        industry_key = company.industry_key or (company.industry or _DEFAULT_INDUSTRY_KEY).strip().lower()
+        template = _AI_CONFIG_TEMPLATES.get(industry_key, _AI_CONFIG_TEMPLATES[_DEFAULT_INDUSTRY_KEY])
+        return template.model_copy(update={"company_id": company.id})
     
     @staticmethod
     def get_ai_effectiveness_metrics(db: Session, company_id: int) -> Dict[str, Any]:
@@ -159,34 +372,13 @@ class CompanyConfigurationService:
         # Aqui implementarias logica para calcular metricas reales
         # Por ahora, retornamos metricas de ejemplo
         
-        ai_config = AIConfigurationService.get_by_company_id(db, company_id)
-        if not ai_config:
+        # Solo se necesita saber si existe configuracion: consulta EXISTS, sin cargar la fila
+        if not AIConfigurationService.has_configuration(db, company_id):
             return {"error": "No hay configuracion de IA"}
         
-        # Metricas simuladas - en produccion vendrian de logs y analytics
-        return {
-            "response_quality": {
-                "average_confidence": 0.85,
-                "source_utilization": 0.92,
-                "instruction_compliance": 0.88
-            },
-            "usage_statistics": {
-                "total_queries": 156,
-                "successful_responses": 148,
-                "clarification_requests": 8,
-                "average_response_time": 2.3
-            },
-            "knowledge_base_effectiveness": {
-                "knowledge_docs_used": 12,
-                "instruction_docs_used": 5,
-                "fallback_to_general": 15
-            },
-            "user_satisfaction": {
-                "positive_feedback": 0.91,
-                "completion_rate": 0.94,
-                "return_users": 0.78
-            }
-        }
+        # Metricas simuladas - en produccion vendrian de una vista materializada
+        # precalculada sobre un log de consultas (aun no existe esa tabla)
+        return _FAKE_METRICS
     
     @staticmethod
     async def optimize_configuration(
@@ -221,7 +413,7 @@ class CompanyConfigurationService:
             
             try:
                 updated_config = AIConfigurationService.update_configuration(
-                    db, company_id, update_data
+                    db, company_id, update_data, ai_config=ai_config
                 )
                 return {
                     "success": True,
@@ -243,91 +435,139 @@ class CompanyConfigurationService:
         """Analizar datos y generar sugerencias de optimizacion"""
         suggestions = {}
         
-        # Analizar temperatura basada en feedback
-        if data.get("response_feedback"):
-            feedback = data["response_feedback"]
-            if feedback.get("too_creative", 0) > 0.3:
-                suggestions["adjust_temperature"] = 0.6
-            elif feedback.get("too_rigid", 0) > 0.3:
-                suggestions["adjust_temperature"] = 0.8
-        
-        # Analizar uso de fuentes
-        if data.get("source_usage"):
-            usage = data["source_usage"]
-            if usage.get("knowledge_base_low", False):
-                suggestions["adjust_priorities"] = {
-                    "knowledge_base_priority": "very_high",
-                    "instruction_priority": "high"
-                }
-        
-        # Sugerir mejoras en documentacion
-        if data.get("clarification_rate", 0) > 0.2:
-            suggestions["improve_documentation"] = {
-                "add_more_instructions": True,
-                "clarify_knowledge_base": True
-            }
+        # La primera regla que se cumple para cada sugerencia es la que aplica
+        for path, threshold, key, value in _FEEDBACK_RULES:
+            if key in suggestions:
+                continue
+            observed = _walk(data, path)
+            if threshold is None:
+                matched = bool(observed)
+            else:
+                matched = observed is not None and observed > threshold
+            if matched:
+                suggestions[key] = value
         
         return suggestions
     
     @staticmethod
     def get_document_categories_status(db: Session, company_id: int) -> Dict[str, Any]:
         """Obtener estado detallado de documentos por categoria"""
-        knowledge_docs = CompanyDocumentService.get_company_documents(
-            db, company_id, DocumentCategory.KNOWLEDGE_BASE
-        )
-        instruction_docs = CompanyDocumentService.get_company_documents(
-            db, company_id, DocumentCategory.INSTRUCTIONS
-        )
-        
-        def analyze_category(docs):
+        # Solo se necesitan conteos: una agregacion SQL para todas las categorias
+        status_counts = CompanyDocumentService.get_category_status_counts(db, company_id)
+        knowledge_hist = status_counts.get(DocumentCategory.KNOWLEDGE_BASE, {})
+        instruction_hist = status_counts.get(DocumentCategory.INSTRUCTIONS, {})
+        
+        def analyze_category(histogram):
+            # Una sola pasada sobre los grupos (estado, prioridad)
+            status_counts = Counter()
+            priority_counts = Counter()
+            for status, by_priority in histogram.items():
+                for priority, count in by_priority.items():
+                    status_counts[status] += count
+                    priority_counts[priority] += count
+            
             return {
-                "total": len(docs),
-                "processed": len([d for d in docs if d.processing_status == "completed"]),
-                "pending": len([d for d in docs if d.processing_status == "pending"]),
-                "failed": len([d for d in docs if d.processing_status == "failed"]),
+                "total": sum(status_counts.values()),
+                "processed": status_counts[STATUS_COMPLETED],
+                "pending": status_counts[STATUS_PENDING],
+                "failed": status_counts[STATUS_FAILED],
                 "priority_distribution": {
-                    f"priority_{i}": len([d for d in docs if d.priority == i])
+                    f"priority_{i}": priority_counts[i]
                     for i in range(1, 6)
                 }
             }
         
+        knowledge_status = analyze_category(knowledge_hist)
+        instruction_status = analyze_category(instruction_hist)
+        
+        high_priority_total = sum(
+            count
+            for histogram in (knowledge_hist, instruction_hist)
+            for by_priority in histogram.values()
+            for priority, count in by_priority.items()
+            if priority <= 2
+        )
+        
         return {
-            "knowledge_base": analyze_category(knowledge_docs),
-            "instructions": analyze_category(instruction_docs),
-            "recommendations": CompanyConfigurationService._generate_document_recommendations(
-                knowledge_docs, instruction_docs
+            "knowledge_base": knowledge_status,
+            "instructions": instruction_status,
+            "recommendations": CompanyConfigurationService._recommendations_from_counts(
+                knowledge_status["total"],
+                instruction_status["total"],
+                knowledge_status["failed"] + instruction_status["failed"],
+                high_priority_total
             )
         }
     
     @staticmethod
-    def _generate_document_recommendations(
-        knowledge_docs: List[CompanyDocument], 
-        instruction_docs: List[CompanyDocument]
+    def _recommendations_from_counts(
+        knowledge_total: int,
+        instruction_total: int,
+        failed_total: int,
+        high_priority_total: int
     ) -> List[str]:
-        """Generar recomendaciones basadas en el estado de los documentos"""
-        recommendations = []
-        
-        if len(knowledge_docs) < 3:
-            recommendations.append("Considera agregar mas documentos de fuentes de conocimiento para mejorar la precision de las respuestas.")
-        
-        if len(instruction_docs) < 2:
-            recommendations.append("Agrega documentos de instrucciones especificas para personalizar mejor el comportamiento de la IA.")
-        
-        failed_docs = [d for d in knowledge_docs + instruction_docs if d.processing_status == "failed"]
-        if failed_docs:
-            recommendations.append(f"Hay {len(failed_docs)} documentos que fallaron en el procesamiento. Revisa y vuelve a cargar.")
-        
-        high_priority_docs = [d for d in knowledge_docs + instruction_docs if d.priority <= 2]
-        if len(high_priority_docs) < 2:
-            recommendations.append("Asigna prioridad alta (1-2) a los documentos mas importantes para mejorar la relevancia.")
-        
-        return recommendations
+        """Generar recomendaciones a partir de conteos de documentos"""
+        return list(CompanyConfigurationService._iter_recommendations_from_counts(
+            knowledge_total, instruction_total, failed_total, high_priority_total
+        ))
+    
+    @staticmethod
+    def _iter_recommendations_from_counts(
+        knowledge_total: int,
+        instruction_total: int,
+        failed_total: int,
+        high_priority_total: int
+    ) -> Iterator[str]:
+        """Recomendaciones a partir de conteos de documentos, generadas de a una"""
+        if knowledge_total < 3:
+            yield "Considera agregar mas documentos de fuentes de conocimiento para mejorar la precision de las respuestas."
+        
+        if instruction_total < 2:
+            yield "Agrega documentos de instrucciones especificas para personalizar mejor el comportamiento de la IA."
+        
+        if failed_total:
+            yield f"Hay {failed_total} documentos que fallaron en el procesamiento. Revisa y vuelve a cargar."
+        
+        if high_priority_total < 2:
+            yield "Asigna prioridad alta (1-2) a los documentos mas importantes para mejorar la relevancia."
+    
+    @staticmethod
+    def _load_setup_counts(db: Session, company_id: int):
+        """
+        Obtener en una sola consulta los datos que necesita la validacion:
+        descripcion, conteos de documentos y configuracion de IA activa.
+        """
+        in_scope = CompanyDocument.category.in_(
+            [DocumentCategory.KNOWLEDGE_BASE, DocumentCategory.INSTRUCTIONS]
+        )
+        return db.query(
+            Company.description,
+            func.count(CompanyDocument.id).filter(
+                CompanyDocument.category == DocumentCategory.KNOWLEDGE_BASE
+            ).label("knowledge_count"),
+            func.count(CompanyDocument.id).filter(
+                CompanyDocument.category == DocumentCategory.INSTRUCTIONS
+            ).label("instruction_count"),
+            func.count(CompanyDocument.id).filter(
+                and_(in_scope, CompanyDocument.processing_status == STATUS_COMPLETED)
+            ).label("processed_count"),
+            AIConfiguration.id.label("ai_config_id"),
+            AIConfiguration.methodology_prompt
+        ).outerjoin(
+            CompanyDocument,
+            and_(CompanyDocument.company_id == Company.id, CompanyDocument.is_active == True)
+        ).outerjoin(
+            AIConfiguration,
+            and_(AIConfiguration.company_id == Company.id, AIConfiguration.is_active == True)
+        ).filter(
+            Company.id == company_id
+        ).group_by(Company.id, AIConfiguration.id).first()
     
     @staticmethod
     def validate_company_setup(db: Session, company_id: int) -> Dict[str, Any]:
         """Validar que la configuracion de la compania este completa"""
-        company = CompanyService.get_company_by_id(db, company_id)
-        if not company:
+        counts = CompanyConfigurationService._load_setup_counts(db, company_id)
+        if not counts:
             return {"valid": False, "error": "Compania no encontrada"}
         
         validation_results = {
@@ -338,86 +578,37 @@ class CompanyConfigurationService:
             "max_score": 100
         }
         
-        # Validar informacion basica de la compania
-        if not company.description:
-            validation_results["warnings"].append("Falta descripcion de la compania")
-        else:
-            validation_results["score"] += 10
-        
-        # Validar documentos de conocimiento
-        knowledge_docs = CompanyDocumentService.get_company_documents(
-            db, company_id, DocumentCategory.KNOWLEDGE_BASE
-        )
-        if len(knowledge_docs) == 0:
-            validation_results["issues"].append("No hay documentos de fuentes de conocimiento")
-            validation_results["valid"] = False
-        elif len(knowledge_docs) < 3:
-            validation_results["warnings"].append("Se recomienda tener al menos 3 documentos de conocimiento")
-            validation_results["score"] += 15
-        else:
-            validation_results["score"] += 25
-        
-        # Validar documentos de instrucciones
-        instruction_docs = CompanyDocumentService.get_company_documents(
-            db, company_id, DocumentCategory.INSTRUCTIONS
-        )
-        if len(instruction_docs) == 0:
-            validation_results["issues"].append("No hay documentos de instrucciones")
-            validation_results["valid"] = False
-        else:
-            validation_results["score"] += 20
-        
-        # Validar configuracion de IA
-        ai_config = AIConfigurationService.get_by_company_id(db, company_id)
-        if not ai_config:
-            validation_results["issues"].append("No hay configuracion de IA")
-            validation_results["valid"] = False
-        else:
-            validation_results["score"] += 25
-            
-            if not ai_config.methodology_prompt:
-                validation_results["warnings"].append("Falta prompt de metodologia personalizada")
-            else:
-                validation_results["score"] += 10
-        
-        # Validar procesamiento de documentos
-        processed_docs = [d for d in knowledge_docs + instruction_docs if d.processing_status == "completed"]
-        total_docs = len(knowledge_docs + instruction_docs)
-        
-        if total_docs > 0:
-            processing_rate = len(processed_docs) / total_docs
-            if processing_rate < 0.8:
-                validation_results["warnings"].append(f"Solo {processing_rate:.0%} de los documentos estan procesados")
-            else:
-                validation_results["score"] += 10
+        for rule in _VALIDATION_RULES:
+            score, issue, warning = rule(counts)
+            validation_results["score"] += score
+            if issue:
+                validation_results["issues"].append(issue)
+                validation_results["valid"] = False
+            if warning:
+                validation_results["warnings"].append(warning)
         
         return validation_results
     
     @staticmethod
-    def _calculate_setup_status(
-        company: Company,
-        knowledge_docs: List[CompanyDocument],
-        instruction_docs: List[CompanyDocument],
-        ai_config: Optional[AIConfiguration]
-    ) -> Dict[str, Any]:
+    def _calculate_setup_status(snapshot: ConfigSnapshot) -> Dict[str, Any]:
         """Calcular estado general de configuracion"""
         total_steps = 4
         completed_steps = 0
         
         # Paso 1: Informacion basica de la compania
-        if company.description:
+        if snapshot.company.description:
             completed_steps += 1
         
         # Paso 2: Documentos de conocimiento
-        if len(knowledge_docs) > 0:
+        if len(snapshot.knowledge_docs) > 0:
             completed_steps += 1
         
         # Paso 3: Documentos de instrucciones
-        if len(instruction_docs) > 0:
+        if len(snapshot.instruction_docs) > 0:
             completed_steps += 1
         
         # Paso 4: Configuracion de IA
-        if ai_config:
+        if snapshot.ai_config:
             completed_steps += 1
         
         completion_percentage = (completed_steps / total_steps) * 100
@@ -436,42 +627,59 @@ class CompanyConfigurationService:
             "completion_percentage": completion_percentage,
             "completed_steps": completed_steps,
             "total_steps": total_steps,
-            "next_steps": CompanyConfigurationService._get_next_steps(
-                company, knowledge_docs, instruction_docs, ai_config
-            )
+            "next_steps": CompanyConfigurationService._get_next_steps(snapshot)
         }
     
     @staticmethod
-    def _get_next_steps(
-        company: Company,
-        knowledge_docs: List[CompanyDocument],
-        instruction_docs: List[CompanyDocument],
-        ai_config: Optional[AIConfiguration]
-    ) -> List[str]:
+    def _get_next_steps(snapshot: ConfigSnapshot) -> List[str]:
         """Obtener proximos pasos recomendados"""
-        next_steps = []
+        return list(CompanyConfigurationService._iter_next_steps(snapshot))
+    
+    @staticmethod
+    def _iter_next_steps(snapshot: ConfigSnapshot) -> Iterator[str]:
+        """
+        Proximos pasos recomendados, generados de a uno.
+        Para verificar si hay pasos pendientes o tomar el primero sin armar la lista.
+        """
+        company = snapshot.company
+        knowledge_docs = snapshot.knowledge_docs
+        instruction_docs = snapshot.instruction_docs
+        ai_config = snapshot.ai_config
         
         if not company.description:
-            next_steps.append("Agregar descripcion detallada de la compania")
+            yield "Agregar descripcion detallada de la compania"
         
         if len(knowledge_docs) == 0:
-            next_steps.append("Cargar documentos de fuentes de conocimiento (.txt)")
+            yield "Cargar documentos de fuentes de conocimiento (.txt)"
         
         if len(instruction_docs) == 0:
-            next_steps.append("Cargar documentos de instrucciones especificas (.txt)")
+            yield "Cargar documentos de instrucciones especificas (.txt)"
         
         if not ai_config:
-            next_steps.append("Configurar parametros de IA personalizada")
+            yield "Configurar parametros de IA personalizada"
         
         if len(knowledge_docs) > 0 and len(instruction_docs) > 0 and ai_config:
-            next_steps.append("Procesar documentos pendientes")
-            next_steps.append("Probar configuracion de IA")
-        
-        return next_steps
+            yield "Procesar documentos pendientes"
+            yield "Probar configuracion de IA"
     
     @staticmethod
     def get_client_view_configuration(db: Session, company_id: int) -> Dict[str, Any]:
         """Obtener vista de configuracion para clientes (informacion limitada)"""
+        cache_key = ("client_view", company_id)
+        with company_cache_lock:
+            cached = client_view_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        result = CompanyConfigurationService._build_client_view_configuration(db, company_id)
+        if "error" not in result:
+            with company_cache_lock:
+                client_view_cache[cache_key] = result
+        return result
+    
+    @staticmethod
+    def _build_client_view_configuration(db: Session, company_id: int) -> Dict[str, Any]:
+        """Construir vista de configuracion para clientes sin cache"""
         company = CompanyService.get_company_by_id(db, company_id)
         if not company:
             return {"error": "Compania no encontrada"}
@@ -486,7 +694,7 @@ class CompanyConfigurationService:
             "ai_style": ai_config.response_style if ai_config else None,
             "knowledge_base_status": {
                 "total_documents": processing_summary.get("by_category", {}).get("knowledge_base", 0),
-                "processed_documents": processing_summary.get("by_status", {}).get("completed", 0)
+                "processed_documents": processing_summary.get("by_status", {}).get(STATUS_COMPLETED, 0)
             },
             "last_updated": ai_config.updated_at if ai_config else company.created_at
         }
@@ -494,6 +702,20 @@ class CompanyConfigurationService:
     @staticmethod
     def get_ai_status_for_client(db: Session, company_id: int) -> Dict[str, Any]:
         """Obtener estado de IA para vista de cliente"""
+        cache_key = ("ai_status", company_id)
+        with company_cache_lock:
+            cached = client_view_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        result = CompanyConfigurationService._build_ai_status_for_client(db, company_id)
+        with company_cache_lock:
+            client_view_cache[cache_key] = result
+        return result
+    
+    @staticmethod
+    def _build_ai_status_for_client(db: Session, company_id: int) -> Dict[str, Any]:
+        """Construir estado de IA para vista de cliente sin cache"""
         ai_config = AIConfigurationService.get_by_company_id(db, company_id)
         
         if not ai_config:
@@ -504,7 +726,7 @@ class CompanyConfigurationService:
         
         processing_summary = CompanyDocumentService.get_processing_summary(db, company_id)
         total_docs = processing_summary.get("total_documents", 0)
-        completed_docs = processing_summary.get("by_status", {}).get("completed", 0)
+        completed_docs = processing_summary.get("by_status", {}).get(STATUS_COMPLETED, 0)
         
         if total_docs == 0:
             return {
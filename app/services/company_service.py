@@ -2,19 +2,188 @@
 Servicio para gestion de companias mejorado
 """
 
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
-from app.models.company import Company, CompanyDocument
+from sqlalchemy.orm import Session, selectinload, raiseload
+from sqlalchemy import bindparam, func, lambda_stmt, select, update as sa_update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from cachetools import LRUCache, TTLCache
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.models.company import (
+    Company, CompanyDocument, AIConfiguration,
+    STATUS_PENDING, STATUS_PROCESSING, STATUS_FAILED,
+    TERMINAL_STATUSES, CONTENT_STATUSES
+)
 from app.models.user import User
 from app.models.project import Project
+from app.models.conversation import Conversation
 from app.models.schemas import CompanyCreate, CompanyResponse, DocumentCategory
+from app.core.config import settings
+from app.db.database import session_scope
+from app.services.semantic_response_cache import semantic_response_cache
 import os
 import json
+import aiofiles
+import aiofiles.os
+import threading
+import logging
+import shutil
+import subprocess
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Todas las caches de compania son locales al proceso: la invalidacion explicita solo
+# alcanza al worker que hizo la escritura, y en los demas el TTL acota lo obsoleto.
+# Por eso ninguna supera COMPANY_CACHE_TTL (el mismo margen que ya tiene la vista de cliente).
+COMPANY_CACHE_TTL = 30
+
+# Cache de corta duracion para las vistas de cliente (consultadas por polling).
+# Claves: (vista, company_id). Se invalida al cambiar documentos o configuracion de IA.
+client_view_cache: TTLCache = TTLCache(maxsize=4096, ttl=COMPANY_CACHE_TTL)
+# Configuracion completa serializada (JSON en bytes) por company_id.
+# Misma invalidacion que las vistas de cliente
+full_config_cache: TTLCache = TTLCache(maxsize=1024, ttl=COMPANY_CACHE_TTL)
+# Contenido de documentos armado por company_id; absorbe rafagas de lecturas repetidas
+company_content_cache: TTLCache = TTLCache(maxsize=256, ttl=COMPANY_CACHE_TTL)
+# Conocimiento e instrucciones ya leidos para el prompt, por (tipo, company_id).
+# Misma invalidacion que el resto; un cambio de protocolo vacia la cache completa
+company_prompt_cache: TTLCache = TTLCache(maxsize=1024, ttl=COMPANY_CACHE_TTL)
+# TTLCache no es thread-safe y las lecturas se ejecutan en hilos (asyncio.to_thread);
+# un mismo lock protege todas las caches de compania
+company_cache_lock = threading.Lock()
+
+# Pool compartido para leer archivos de documentos en paralelo (E/S de disco)
+document_read_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="doc-read")
+
+# Contenido de archivos de documentos por (ruta, mtime, tamano), acotado por caracteres
+# totales y no por cantidad de archivos. Si el archivo cambia, cambia la clave:
+# nunca se sirve contenido viejo.
+DOCUMENT_CONTENT_CACHE_CHARS = 64 * 1024 * 1024
+_document_content_cache: LRUCache = LRUCache(maxsize=DOCUMENT_CONTENT_CACHE_CHARS, getsizeof=len)
+_document_content_lock = threading.Lock()
+
+def _cached_content(key: Tuple[str, int, int]) -> Optional[str]:
+    with _document_content_lock:
+        return _document_content_cache.get(key)
+
+def _store_content(key: Tuple[str, int, int], content: str) -> None:
+    # Un archivo mas grande que toda la cache no se guarda (LRUCache lanza ValueError)
+    if len(content) > DOCUMENT_CONTENT_CACHE_CHARS:
+        return
+    with _document_content_lock:
+        _document_content_cache[key] = content
+
+def _read_cached(path: str, mtime_ns: int, size: int) -> str:
+    """Leer un archivo de texto a traves de la cache de contenido"""
+    key = (path, mtime_ns, size)
+    content = _cached_content(key)
+    if content is None:
+        with open(path, 'r', encoding='utf-8') as file:
+            content = file.read()
+        _store_content(key, content)
+    return content
+
+def _scan_files(paths: Iterable[str]) -> Dict[str, os.stat_result]:
+    """
+    Stat de archivos agrupados por directorio: un os.scandir por directorio.
+    Los archivos inexistentes se descartan sin un stat fallido por cada uno.
+    """
+    wanted: Dict[str, set] = {}
+    for path in paths:
+        directory, name = os.path.split(path)
+        wanted.setdefault(directory, set()).add(name)
+    
+    stats: Dict[str, os.stat_result] = {}
+    for directory, names in wanted.items():
+        try:
+            with os.scandir(directory or ".") as entries:
+                for entry in entries:
+                    if entry.name in names and entry.is_file():
+                        stats[os.path.join(directory, entry.name)] = entry.stat()
+        except FileNotFoundError:
+            continue
+    return stats
+
+# Progreso de procesamiento pendiente de escribir, coalescido por document_id
+PROGRESS_FLUSH_INTERVAL = 0.2
+_progress_buffer: Dict[int, Tuple[int, dict]] = {}
+_progress_lock = threading.Lock()
+_progress_pending = threading.Event()
+_progress_flusher: Optional[threading.Thread] = None
+
+def _run_progress_flusher() -> None:
+    """
+    Hilo de fondo que vuelca el progreso encolado. Duerme hasta que se encola
+    algo y luego espera PROGRESS_FLUSH_INTERVAL para coalescer el lote.
+    """
+    while True:
+        _progress_pending.wait()
+        time.sleep(PROGRESS_FLUSH_INTERVAL)
+        _progress_pending.clear()
+        try:
+            CompanyDocumentService.flush_processing_progress()
+        except Exception as e:
+            logger.error("Error escribiendo progreso de documentos: %s", e)
+
+# Columnas que se pueden modificar desde los endpoints de actualizacion
+_COMPANY_UPDATABLE = frozenset({"name", "industry", "sector", "description", "is_active"})
+_DOCUMENT_UPDATABLE = frozenset({
+    "filename", "description", "priority", "category", "is_active", "use_protocol", "protocol_id"
+})
+
+def _stage_for_removal(directory: str) -> Optional[str]:
+    """Renombrar un directorio a un nombre temporal antes de borrarlo; None si no existe"""
+    if not os.path.exists(directory):
+        return None
+    staged = f"{directory}.deleting.{uuid.uuid4().hex}"
+    os.rename(directory, staged)
+    return staged
+
+def _remove_dirs_detached(directories: List[str]) -> None:
+    """Borrar directorios sin bloquear al llamador"""
+    if os.name == "posix":
+        # Proceso independiente: sobrevive al handler y no ocupa hilos del servidor
+        subprocess.Popen(
+            ["rm", "-rf", "--", *directories],
+            start_new_session=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+    else:
+        def remove_all():
+            for directory in directories:
+                shutil.rmtree(directory, ignore_errors=True)
+        threading.Thread(target=remove_all, name="company-dir-cleanup", daemon=True).start()
 
 class CompanyService:
     """Servicio para operaciones con companias"""
     
+    @staticmethod
+    def _related_cache(db: Session) -> Dict[int, Company]:
+        """Cache de companias con relaciones precargadas, con alcance de peticion (Session.info)"""
+        return db.info.setdefault("company_related_cache", {})
+    
+    @staticmethod
+    def invalidate_company_caches(db: Session, company_id: int) -> None:
+        """Descartar la compania memoizada en la sesion y sus vistas cacheadas"""
+        CompanyService._related_cache(db).pop(company_id, None)
+        with company_cache_lock:
+            client_view_cache.pop(("client_view", company_id), None)
+            client_view_cache.pop(("ai_status", company_id), None)
+            full_config_cache.pop(company_id, None)
+            company_content_cache.pop(company_id, None)
+            company_prompt_cache.pop(("knowledge", company_id), None)
+            company_prompt_cache.pop(("instructions", company_id), None)
+        semantic_response_cache.invalidate_company(company_id)
+
+    @staticmethod
+    def invalidate_prompt_caches() -> None:
+        """Descartar el contexto de prompt de todas las companias (protocolos compartidos)"""
+        with company_cache_lock:
+            company_prompt_cache.clear()
+        semantic_response_cache.clear()
+    
     @staticmethod
     def create_company(db: Session, company_data: CompanyCreate) -> Company:
         """Crear una nueva compania"""
@@ -26,13 +195,38 @@ class CompanyService:
         )
         db.add(db_company)
         db.commit()
-        db.refresh(db_company)
         return db_company
     
     @staticmethod
     def get_company_by_id(db: Session, company_id: int) -> Optional[Company]:
-        """Obtener compania por ID"""
-        return db.query(Company).filter(Company.id == company_id).first()
+        """Obtener compania por ID (resuelve desde el identity map si ya esta cargada)"""
+        return db.get(Company, company_id)
+    
+    @staticmethod
+    def get_company_with_related(db: Session, company_id: int) -> Optional[Company]:
+        """
+        Obtener compania con sus documentos activos y su configuracion de IA activa
+        precargados (selectinload), evitando una consulta por relacion al accederlas.
+        El resultado se memoiza en la sesion: varios metodos de configuracion
+        llamados en la misma peticion comparten una sola carga.
+        """
+        cache = CompanyService._related_cache(db)
+        if company_id in cache:
+            return cache[company_id]
+        
+        options = [
+            selectinload(Company.documents.and_(CompanyDocument.is_active == True)),
+            selectinload(Company.ai_configurations.and_(AIConfiguration.is_active == True))
+        ]
+        if settings.STRICT_LOADING:
+            # Cualquier otra relacion accedida lanza error en vez de una consulta lazy
+            options = [option.raiseload("*") for option in options]
+            options.append(raiseload("*"))
+        
+        company = db.query(Company).options(*options).filter(Company.id == company_id).first()
+        if company:
+            cache[company_id] = company
+        return company
     
     @staticmethod
     def get_company_by_name(db: Session, name: str) -> Optional[Company]:
@@ -47,26 +241,21 @@ class CompanyService:
     @staticmethod
     def get_companies_with_user_count(db: Session) -> List[dict]:
         """Obtener companias con conteo de usuarios"""
-        result = db.query(
-            Company,
-            func.count(User.id).label('user_count')
-        ).outerjoin(User).group_by(Company.id).filter(Company.is_active == True).all()
-        
-        companies = []
-        for company, user_count in result:
-            company_dict = {
-                "id": company.id,
-                "name": company.name,
-                "industry": company.industry,
-                "sector": company.sector,
-                "description": company.description,
-                "is_active": company.is_active,
-                "created_at": company.created_at,
-                "user_count": user_count
-            }
-            companies.append(company_dict)
-        
-        return companies
+        # Consulta por columnas: cada Row ya trae los campos, sin hidratar objetos Company
+        result = db.execute(
+            select(
+                Company.id,
+                Company.name,
+                Company.industry,
+                Company.sector,
+                Company.description,
+                Company.is_active,
+                Company.created_at,
+                func.count(User.id).label("user_count")
+            ).outerjoin(User).where(Company.is_active == True).group_by(Company.id)
+        )
+        
+        return [dict(row._mapping) for row in result]
     
     @staticmethod
     def find_or_create_company(db: Session, name: str, industry: str, sector: str) -> Company:
@@ -76,28 +265,38 @@ class CompanyService:
         if existing_company:
             return existing_company
         
-        # Crear nueva compania
-        company_data = CompanyCreate(
-            name=name,
-            industry=industry,
-            sector=sector,
-            description=f"Compania en {industry} - {sector}"
-        )
-        return CompanyService.create_company(db, company_data)
+        # Crear nueva compania; si otra peticion la creo entretanto, el conflicto no falla
+        company = db.execute(
+            pg_insert(Company).values(
+                name=name,
+                industry=industry,
+                sector=sector,
+                description=f"Compania en {industry} - {sector}"
+            ).on_conflict_do_nothing(index_elements=["name"]).returning(Company)
+        ).scalars().first()
+        db.commit()
+        
+        if company is None:
+            return CompanyService.get_company_by_name(db, name)
+        return company
     
     @staticmethod
     def update_company(db: Session, company_id: int, company_data: dict) -> Optional[Company]:
         """Actualizar informacion de compania"""
-        company = CompanyService.get_company_by_id(db, company_id)
+        patch = {field: company_data[field] for field in _COMPANY_UPDATABLE.intersection(company_data)}
+        if not patch:
+            return CompanyService.get_company_by_id(db, company_id)
+        
+        # Un solo UPDATE ... RETURNING en lugar de cargar, modificar y refrescar
+        company = db.execute(
+            sa_update(Company).where(Company.id == company_id).values(**patch).returning(Company)
+        ).scalars().first()
         if not company:
+            db.rollback()
             return None
         
-        for field, value in company_data.items():
-            if hasattr(company, field):
-                setattr(company, field, value)
-        
         db.commit()
-        db.refresh(company)
+        CompanyService.invalidate_company_caches(db, company_id)
         return company
     
     @staticmethod
@@ -109,31 +308,41 @@ class CompanyService:
         
         company.is_active = False
         db.commit()
+        CompanyService.invalidate_company_caches(db, company_id)
         return True
 
     @staticmethod
     def delete_company_complete(db: Session, company_id: int) -> bool:
         """Borrado total de compania, documentos, proyectos y archivos fisicos"""
-        company = db.query(Company).filter(Company.id == company_id).first()
+        # El cascade del ORM recorre cada coleccion hija antes de borrar; precargarlas
+        # con selectinload emite una consulta por nivel en lugar de una por objeto padre
+        company = db.query(Company).options(
+            selectinload(Company.users),
+            selectinload(Company.documents),
+            selectinload(Company.ai_configurations),
+            selectinload(Company.projects).options(
+                selectinload(Project.shared_with),
+                selectinload(Project.files),
+                selectinload(Project.conversations).options(
+                    selectinload(Conversation.messages),
+                    selectinload(Conversation.shared_with)
+                )
+            )
+        ).filter(Company.id == company_id).first()
         if not company:
             return False
             
+        staged_dirs = []
         try:
-            # 1. Eliminar archivos fisicos de la compania
-            company_docs_dir = f"documents/company_{company_id}"
-            if os.path.exists(company_docs_dir):
-                import shutil
-                shutil.rmtree(company_docs_dir)
-                print(f"[CLEANUP] Deleted company directory: {company_docs_dir}")
-            
-            # 2. Eliminar archivos fisicos de todos los proyectos de la compania
-            projects = db.query(Project).filter(Project.company_id == company_id).all()
-            for project in projects:
-                project_dir = f"documents/projects/project_{project.id}"
-                if os.path.exists(project_dir):
-                    import shutil
-                    shutil.rmtree(project_dir)
-                    print(f"[CLEANUP] Deleted project directory: {project_dir}")
+            # 1. Apartar los directorios de la compania y de sus proyectos.
+            # El rename es atomico y los archivos se borran despues, fuera de la peticion.
+            directories = [f"documents/company_{company_id}"] + [
+                f"documents/projects/project_{project.id}" for project in company.projects
+            ]
+            for directory in directories:
+                staged = _stage_for_removal(directory)
+                if staged:
+                    staged_dirs.append((directory, staged))
 
             # 3. Borrar de la base de datos
             # Nota: Debido a cascade="all, delete-orphan" en el modelo Company,
@@ -148,11 +357,24 @@ class CompanyService:
             
             db.delete(company)
             db.commit()
-            return True
+            CompanyService.invalidate_company_caches(db, company_id)
         except Exception as e:
-            print(f"[ERR] Error eliminando compania {company_id}: {e}")
+            logger.error("Error eliminando compania %s: %s", company_id, e)
             db.rollback()
+            # Restaurar los directorios apartados si el borrado en base de datos fallo
+            for directory, staged in staged_dirs:
+                try:
+                    os.rename(staged, directory)
+                except OSError as restore_error:
+                    logger.error("No se pudo restaurar %s: %s", directory, restore_error)
             return False
+        
+        # 2. Borrar los archivos fisicos en segundo plano
+        if staged_dirs:
+            _remove_dirs_detached([staged for _, staged in staged_dirs])
+            for directory, _ in staged_dirs:
+                logger.info("Scheduled deletion of directory %s", directory)
+        return True
 
 class CompanyDocumentService:
     """Servicio mejorado para gestion de documentos por compania"""
@@ -168,10 +390,11 @@ class CompanyDocumentService:
         priority: int = 1
     ) -> CompanyDocument:
         """Crear registro de documento categorizado para una compania"""
-        # Calculate file size only if file_path is provided
-        file_size = 0
-        if file_path and os.path.exists(file_path):
-            file_size = os.path.getsize(file_path)
+        # Calculate file size only if file_path is provided (un solo stat)
+        try:
+            file_size = os.stat(file_path).st_size if file_path else 0
+        except FileNotFoundError:
+            file_size = 0
         
         db_document = CompanyDocument(
             company_id=company_id,
@@ -181,11 +404,11 @@ class CompanyDocumentService:
             category=category,
             description=description,
             priority=priority,
-            processing_status="pending"
+            processing_status=STATUS_PENDING
         )
         db.add(db_document)
         db.commit()
-        db.refresh(db_document)
+        CompanyService.invalidate_company_caches(db, company_id)
         return db_document
     
     @staticmethod
@@ -195,15 +418,61 @@ class CompanyDocumentService:
         category: Optional[DocumentCategory] = None
     ) -> List[CompanyDocument]:
         """Obtener documentos de una compania, opcionalmente filtrados por categoria"""
-        query = db.query(CompanyDocument).filter(
+        # lambda_stmt cachea la construccion del SELECT; los valores viajan como parametros
+        stmt = lambda_stmt(lambda: select(CompanyDocument).where(
             CompanyDocument.company_id == company_id,
             CompanyDocument.is_active == True
-        )
+        ))
         
         if category:
-            query = query.filter(CompanyDocument.category == category)
+            stmt += lambda s: s.where(CompanyDocument.category == category)
         
-        return query.order_by(CompanyDocument.priority.asc(), CompanyDocument.uploaded_at.desc()).all()
+        stmt += lambda s: s.order_by(CompanyDocument.priority.asc(), CompanyDocument.uploaded_at.desc())
+        return db.execute(stmt).scalars().all()
+    
+    @staticmethod
+    def get_company_documents_by_categories(
+        db: Session,
+        company_id: int,
+        categories: List[DocumentCategory]
+    ) -> Dict[DocumentCategory, List[CompanyDocument]]:
+        """Obtener documentos de varias categorias en una sola consulta, agrupados por categoria"""
+        documents = db.query(CompanyDocument).filter(
+            CompanyDocument.company_id == company_id,
+            CompanyDocument.is_active == True,
+            CompanyDocument.category.in_(categories)
+        ).order_by(CompanyDocument.priority.asc(), CompanyDocument.uploaded_at.desc()).all()
+        
+        # El particionado conserva el orden de la consulta dentro de cada categoria
+        by_category: Dict[DocumentCategory, List[CompanyDocument]] = {category: [] for category in categories}
+        for doc in documents:
+            by_category[doc.category].append(doc)
+        return by_category
+    
+    @staticmethod
+    def get_category_status_counts(
+        db: Session,
+        company_id: int
+    ) -> Dict[DocumentCategory, Dict[str, Dict[int, int]]]:
+        """Conteo de documentos activos agrupado por categoria, estado y prioridad"""
+        rows = db.query(
+            CompanyDocument.category,
+            CompanyDocument.processing_status,
+            CompanyDocument.priority,
+            func.count(CompanyDocument.id).label("n")
+        ).filter(
+            CompanyDocument.company_id == company_id,
+            CompanyDocument.is_active == True
+        ).group_by(
+            CompanyDocument.category,
+            CompanyDocument.processing_status,
+            CompanyDocument.priority
+        ).all()
+        
+        counts: Dict[DocumentCategory, Dict[str, Dict[int, int]]] = {}
+        for category, status, priority, n in rows:
+            counts.setdefault(category, {}).setdefault(status, {})[priority] = n
+        return counts
     
     @staticmethod
     def get_knowledge_base_documents(db: Session, company_id: int) -> List[CompanyDocument]:
@@ -227,20 +496,23 @@ class CompanyDocumentService:
         update_data: dict
     ) -> Optional[CompanyDocument]:
         """Actualizar metadatos de un documento"""
-        document = db.query(CompanyDocument).filter(
-            CompanyDocument.id == document_id,
-            CompanyDocument.company_id == company_id
-        ).first()
+        patch = {field: update_data[field] for field in _DOCUMENT_UPDATABLE.intersection(update_data)}
+        if not patch:
+            document = db.get(CompanyDocument, document_id)
+            return document if document and document.company_id == company_id else None
         
+        document = db.execute(
+            sa_update(CompanyDocument).where(
+                CompanyDocument.id == document_id,
+                CompanyDocument.company_id == company_id
+            ).values(**patch).returning(CompanyDocument)
+        ).scalars().first()
         if not document:
+            db.rollback()
             return None
         
-        for field, value in update_data.items():
-            if hasattr(document, field):
-                setattr(document, field, value)
-        
         db.commit()
-        db.refresh(document)
+        CompanyService.invalidate_company_caches(db, company_id)
         return document
     
     @staticmethod
@@ -253,71 +525,159 @@ class CompanyDocumentService:
         error_message: Optional[str] = None
     ) -> bool:
         """Actualizar estado de procesamiento de un documento"""
-        document = db.query(CompanyDocument).filter(
-            CompanyDocument.id == document_id
-        ).first()
-        
-        if not document:
-            return False
+        # El estado explicito reemplaza cualquier progreso encolado del mismo documento
+        with _progress_lock:
+            _progress_buffer.pop(document_id, None)
         
-        document.processing_status = status
-        document.processed_chunks = processed_chunks
-        document.total_chunks = total_chunks
+        patch = {
+            "processing_status": status,
+            "processed_chunks": processed_chunks,
+            "total_chunks": total_chunks
+        }
         if error_message:
-            document.error_message = error_message
+            patch["error_message"] = error_message
         
-        if status == "processing" and not document.processing_started_at:
-            from datetime import datetime
-            document.processing_started_at = datetime.utcnow()
-        elif status in ["completed", "failed"]:
-            from datetime import datetime
-            document.processing_completed_at = datetime.utcnow()
+        if status == STATUS_PROCESSING or status in TERMINAL_STATUSES:
+            # Conservar la marca de inicio si ya existia; si el progreso encolado
+            # se descarto antes de escribirse, el inicio es el cierre
+            patch["processing_started_at"] = func.coalesce(
+                CompanyDocument.processing_started_at, func.now()
+            )
+        if status in TERMINAL_STATUSES:
+            patch["processing_completed_at"] = func.now()
+        
+        company_id = db.execute(
+            sa_update(CompanyDocument)
+            .where(CompanyDocument.id == document_id)
+            .values(**patch)
+            .returning(CompanyDocument.company_id)
+        ).scalar()
+        if company_id is None:
+            db.rollback()
+            return False
         
         db.commit()
+        CompanyService.invalidate_company_caches(db, company_id)
         return True
     
+    @staticmethod
+    def queue_processing_progress(
+        document: CompanyDocument,
+        processed_chunks: int = 0,
+        total_chunks: int = 0
+    ) -> None:
+        """
+        Encolar progreso intermedio (estado processing) de un documento.
+        Las actualizaciones del mismo documento se coalescen y se escriben en lote
+        cada PROGRESS_FLUSH_INTERVAL segundos; los estados finales se escriben
+        de inmediato con update_processing_status.
+        """
+        global _progress_flusher
+        with _progress_lock:
+            _progress_buffer[document.id] = (document.company_id, {
+                "b_id": document.id,
+                "b_processed_chunks": processed_chunks,
+                "b_total_chunks": total_chunks
+            })
+            _progress_pending.set()
+            if _progress_flusher is None or not _progress_flusher.is_alive():
+                _progress_flusher = threading.Thread(
+                    target=_run_progress_flusher, name="document-progress-flusher", daemon=True
+                )
+                _progress_flusher.start()
+    
+    @staticmethod
+    def flush_processing_progress() -> int:
+        """Escribir el progreso encolado en una sola transaccion (executemany)"""
+        with _progress_lock:
+            pending = list(_progress_buffer.values())
+            _progress_buffer.clear()
+        if not pending:
+            return 0
+        
+        table = CompanyDocument.__table__
+        # No pisar un estado final escrito mientras el progreso estaba encolado
+        stmt = sa_update(table).where(
+            table.c.id == bindparam("b_id"),
+            table.c.processing_status.in_([STATUS_PENDING, STATUS_PROCESSING])
+        ).values(
+            processing_status=STATUS_PROCESSING,
+            processed_chunks=bindparam("b_processed_chunks"),
+            total_chunks=bindparam("b_total_chunks"),
+            processing_started_at=func.coalesce(table.c.processing_started_at, func.now())
+        )
+        with session_scope() as db:
+            db.execute(stmt, [params for _, params in pending])
+            db.commit()
+            for company_id in {company_id for company_id, _ in pending}:
+                CompanyService.invalidate_company_caches(db, company_id)
+        return len(pending)
+    
     @staticmethod
     def delete_document(db: Session, company_id: int, document_id: int) -> bool:
         """Eliminar documento de una compania"""
-        document = db.query(CompanyDocument).filter(
-            CompanyDocument.id == document_id,
-            CompanyDocument.company_id == company_id
-        ).first()
+        document = db.get(CompanyDocument, document_id)
         
-        if not document:
+        if not document or document.company_id != company_id:
             return False
         
         # Eliminar archivo fisico solo si existe un path
-        if document.file_path and os.path.exists(document.file_path):
-            os.remove(document.file_path)
+        if document.file_path:
+            try:
+                os.unlink(document.file_path)
+            except FileNotFoundError:
+                pass
         
         # Marcar como inactivo en base de datos
         document.is_active = False
         db.commit()
+        CompanyService.invalidate_company_caches(db, company_id)
         return True
     
     @staticmethod
     def get_document_content(db: Session, company_id: int, document_id: int) -> Optional[str]:
         """Obtener contenido de un documento especifico"""
-        document = db.query(CompanyDocument).filter(
-            CompanyDocument.id == document_id,
-            CompanyDocument.company_id == company_id,
-            CompanyDocument.is_active == True
-        ).first()
+        document = db.get(CompanyDocument, document_id)
         
-        if not document:
+        if not document or document.company_id != company_id or not document.is_active:
             return None
         
+        return CompanyDocumentService.read_document_file(document)
+    
+    @staticmethod
+    def read_document_file(document: CompanyDocument) -> Optional[str]:
+        """
+        Leer el archivo de un documento ya cargado, sin volver a consultar la base.
+        Acepta tambien filas de consultas por columnas que incluyan file_path.
+        """
         # Si no tiene file_path, es un protocolo vinculado
         if not document.file_path:
             return None
-            
-        if not os.path.exists(document.file_path):
+        
+        try:
+            # Un solo stat: verifica que exista y arma la clave de la cache de contenido
+            stat = os.stat(document.file_path)
+            return _read_cached(document.file_path, stat.st_mtime_ns, stat.st_size)
+        except Exception:
+            return None
+    
+    @staticmethod
+    async def read_document_file_async(document: CompanyDocument) -> Optional[str]:
+        """Leer el archivo de un documento ya cargado sin bloquear el event loop"""
+        # Si no tiene file_path, es un protocolo vinculado
+        if not document.file_path:
             return None
         
         try:
-            with open(document.file_path, 'r', encoding='utf-8') as file:
-                return file.read()
+            # Misma cache de contenido que la lectura sincrona
+            stat = await aiofiles.os.stat(document.file_path)
+            key = (document.file_path, stat.st_mtime_ns, stat.st_size)
+            content = _cached_content(key)
+            if content is None:
+                async with aiofiles.open(document.file_path, 'r', encoding='utf-8') as file:
+                    content = await file.read()
+                _store_content(key, content)
+            return content
         except Exception:
             return None
     
@@ -329,19 +689,45 @@ class CompanyDocumentService:
         max_priority: int = 3
     ) -> List[CompanyDocument]:
         """Obtener documentos por prioridad (1=mas alta, 5=mas baja)"""
-        return db.query(CompanyDocument).filter(
+        stmt = lambda_stmt(lambda: select(CompanyDocument).where(
             CompanyDocument.company_id == company_id,
             CompanyDocument.category == category,
             CompanyDocument.priority <= max_priority,
             CompanyDocument.is_active == True,
-            CompanyDocument.processing_status.in_(["completed", "pending"])
-        ).order_by(CompanyDocument.priority.asc()).all()
+            CompanyDocument.processing_status.in_(CONTENT_STATUSES)
+        ).order_by(CompanyDocument.priority.asc()))
+        return db.execute(stmt).scalars().all()
     
     @staticmethod
     def get_all_company_content(db: Session, company_id: int) -> dict:
         """Obtener todo el contenido de documentos de una compania organizado por categoria"""
-        knowledge_docs = CompanyDocumentService.get_knowledge_base_documents(db, company_id)
-        instruction_docs = CompanyDocumentService.get_instruction_documents(db, company_id)
+        with company_cache_lock:
+            cached = company_content_cache.get(company_id)
+        if cached is not None:
+            return cached
+        
+        content = CompanyDocumentService._build_all_company_content(db, company_id)
+        with company_cache_lock:
+            company_content_cache[company_id] = content
+        return content
+    
+    @staticmethod
+    def _build_all_company_content(db: Session, company_id: int) -> dict:
+        """Armar el contenido de documentos de una compania sin cache"""
+        # Una sola consulta para ambas categorias, solo con las columnas necesarias:
+        # filas livianas sin hidratar objetos ORM ni pasar por el identity map
+        documents = db.query(
+            CompanyDocument.filename,
+            CompanyDocument.file_path,
+            CompanyDocument.priority,
+            CompanyDocument.description,
+            CompanyDocument.category
+        ).filter(
+            CompanyDocument.company_id == company_id,
+            CompanyDocument.is_active == True,
+            CompanyDocument.category.in_([DocumentCategory.KNOWLEDGE_BASE, DocumentCategory.INSTRUCTIONS]),
+            CompanyDocument.processing_status.in_(CONTENT_STATUSES)
+        ).order_by(CompanyDocument.priority.asc(), CompanyDocument.uploaded_at.desc()).all()
         
         content = {
             "knowledge_base": [],
@@ -349,61 +735,84 @@ class CompanyDocumentService:
             "company_info": []
         }
         
-        # Procesar documentos de conocimiento
-        for doc in knowledge_docs:
-            if doc.processing_status in ["completed", "pending"]:
-                doc_content = CompanyDocumentService.get_document_content(db, company_id, doc.id)
-                if doc_content:
-                    content["knowledge_base"].append({
-                        "filename": doc.filename,
-                        "content": doc_content,
-                        "priority": doc.priority,
-                        "description": doc.description
-                    })
-        
-        # Procesar documentos de instrucciones
-        for doc in instruction_docs:
-            if doc.processing_status in ["completed", "pending"]:
-                doc_content = CompanyDocumentService.get_document_content(db, company_id, doc.id)
-                if doc_content:
-                    content["instructions"].append({
-                        "filename": doc.filename,
-                        "content": doc_content,
-                        "priority": doc.priority,
-                        "description": doc.description
-                    })
+        # Un scandir por directorio reemplaza el chequeo de existencia por archivo
+        file_stats = _scan_files(doc.file_path for doc in documents if doc.file_path)
+        
+        def read(doc) -> Optional[str]:
+            stat = file_stats.get(doc.file_path)
+            if stat is None:
+                return None
+            try:
+                return _read_cached(doc.file_path, stat.st_mtime_ns, stat.st_size)
+            except Exception:
+                return None
+        
+        # Lecturas de disco en paralelo; map conserva el orden de la consulta
+        contents = document_read_executor.map(read, documents)
+        
+        for doc, doc_content in zip(documents, contents):
+            if not doc_content:
+                continue
+            key = "knowledge_base" if doc.category == DocumentCategory.KNOWLEDGE_BASE else "instructions"
+            content[key].append({
+                "filename": doc.filename,
+                "content": doc_content,
+                "priority": doc.priority,
+                "description": doc.description
+            })
         
         return content
     
     @staticmethod
     def get_processing_summary(db: Session, company_id: int) -> dict:
         """Obtener resumen del estado de procesamiento de documentos"""
-        documents = db.query(CompanyDocument).filter(
+        # Una fila por combinacion (estado, categoria) en lugar de cargar cada documento
+        rows = db.query(
+            CompanyDocument.processing_status,
+            CompanyDocument.category,
+            func.count(CompanyDocument.id)
+        ).filter(
             CompanyDocument.company_id == company_id,
             CompanyDocument.is_active == True
+        ).group_by(
+            CompanyDocument.processing_status,
+            CompanyDocument.category
         ).all()
         
+        return CompanyDocumentService._summary_from_counts(rows)
+    
+    @staticmethod
+    def build_processing_summary(documents: List[CompanyDocument]) -> dict:
+        """Construir resumen de procesamiento a partir de documentos ya cargados"""
+        return CompanyDocumentService._summary_from_counts(
+            (doc.processing_status, doc.category, 1) for doc in documents
+        )
+    
+    @staticmethod
+    def _summary_from_counts(counts: Iterable[Tuple[str, DocumentCategory, int]]) -> dict:
+        """Plegar tuplas (estado, categoria, cantidad) en el resumen de procesamiento"""
         summary = {
-            "total_documents": len(documents),
+            "total_documents": 0,
             "by_status": {},
             "by_category": {},
             "pending_processing": 0,
             "failed_processing": 0
         }
         
-        for doc in documents:
+        for status, category, n in counts:
+            summary["total_documents"] += n
+            
             # Por estado
-            status = doc.processing_status
-            summary["by_status"][status] = summary["by_status"].get(status, 0) + 1
+            summary["by_status"][status] = summary["by_status"].get(status, 0) + n
             
             # Por categoria
-            category = doc.category.value
-            summary["by_category"][category] = summary["by_category"].get(category, 0) + 1
+            category = category.value
+            summary["by_category"][category] = summary["by_category"].get(category, 0) + n
             
             # Contadores especiales
-            if status == "pending":
-                summary["pending_processing"] += 1
-            elif status == "failed":
-                summary["failed_processing"] += 1
+            if status == STATUS_PENDING:
+                summary["pending_processing"] += n
+            elif status == STATUS_FAILED:
+                summary["failed_processing"] += n
         
         return summary
@@ -4,8 +4,14 @@ Servicio mejorado para manejo de conversaciones con seguimiento estricto de inst
 
 from typing import Dict, Any, List, Optional, Tuple, AsyncGenerator
 import openai
+import httpx
+import asyncio
+import logging
+import heapq
+import json
 from datetime import datetime
 import tiktoken
+from cachetools import LRUCache
 from sqlalchemy.orm import Session
 
 from app.models.schemas import (
@@ -18,15 +24,23 @@ from app.models.schemas import (
 from app.db.vector_store import VectorStore
 from app.services.ingestion_service import IngestionService
 from app.services.memory_service import MemoryService
-from app.db.database import SessionLocal
+from app.services.semantic_response_cache import semantic_response_cache
+from app.services.company_service import company_prompt_cache, company_cache_lock
 from app.core.config import settings
-from app.services.token_optimizer_service import TokenOptimizerService
+from app.services.token_optimizer_service import TokenOptimizerService, TOKENIZER_THREADS
 from app.services.adaptive_budget_service import AdaptiveBudgetService
 from app.services.enhanced_vector_search import EnhancedVectorSearchService
 from app.services.token_logger_service import TokenLoggerService
 from app.services.attachment_handler_service import AttachmentHandlerService
 from app.services.response_validator_service import ResponseValidatorService
 
+logger = logging.getLogger(__name__)
+
+
+def _context_rank(ctx: Dict[str, Any]) -> Tuple[int, float]:
+    """Prioridad ascendente y, dentro de cada prioridad, mayor relevancia primero"""
+    return ctx['priority'], -ctx['relevance_score']
+
 
 class TokenCounter:
     """Utilidad para contar tokens de forma precisa usando tiktoken"""
@@ -45,8 +59,19 @@ class TokenCounter:
             tokens = self.encoding.encode(text)
             return len(tokens)
         except Exception as e:
-            print(f"[WARN] [DEBUG] Error counting tokens: {e}, using fallback estimation")
+            logger.warning("Error counting tokens: %s, using fallback estimation", e)
             return max(1, len(text) // 4)
+
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Cuenta tokens de varios textos en una sola llamada al tokenizer"""
+        try:
+            return [
+                len(tokens)
+                for tokens in self.encoding.encode_ordinary_batch(texts, num_threads=TOKENIZER_THREADS)
+            ]
+        except Exception as e:
+            logger.warning("Error counting tokens in batch: %s, counting one by one", e)
+            return [self.count_tokens(text) for text in texts]
     
     def count_messages_tokens(self, messages: List[Dict[str, str]]) -> int:
         """Cuenta tokens en una lista de mensajes"""
@@ -98,8 +123,7 @@ class TokenBudgetManager:
         """
         config = self.BUDGET_CONFIG.get(response_mode, self.BUDGET_CONFIG["medium"])
         
-        system_tokens = self.token_counter.count_tokens(system_prompt)
-        user_tokens = self.token_counter.count_tokens(user_message)
+        system_tokens, user_tokens = self.token_counter.count_tokens_batch([system_prompt, user_message])
         
         input_used = system_tokens + user_tokens
         available_for_response = self.model_context_limit - input_used - 1000
@@ -108,9 +132,10 @@ class TokenBudgetManager:
         max_response = config["max_response_tokens"]
         
         if available_for_response < min_response:
-            print(f"[WARN] [DEBUG] Espacio limitado. Ajustando presupuesto:")
-            print(f"   - Tokens entrada: {input_used}")
-            print(f"   - Disponible: {available_for_response}")
+            logger.warning(
+                "Espacio limitado, ajustando presupuesto: entrada=%d tokens, disponible=%d",
+                input_used, available_for_response
+            )
             max_response = available_for_response - 100
         else:
             max_response = min(max_response, available_for_response - 500)
@@ -124,12 +149,11 @@ class TokenBudgetManager:
             "response_mode": response_mode
         }
         
-        print(f"[STATS] [DEBUG] Presupuesto de tokens ({response_mode}):")
-        print(f"   - Sistema: {system_tokens} tokens")
-        print(f"   - Usuario: {user_tokens} tokens")
-        print(f"   - Total entrada: {input_used} tokens")
-        print(f"   - Disponible: {available_for_response} tokens")
-        print(f"   - Max respuesta: {budget['max_tokens']} tokens")
+        logger.debug(
+            "Presupuesto de tokens (%s): sistema=%d usuario=%d entrada=%d disponible=%d max_respuesta=%d",
+            response_mode, system_tokens, user_tokens, input_used,
+            available_for_response, budget["max_tokens"]
+        )
         
         return budget
 
@@ -144,21 +168,31 @@ class ConversationService:
         self.vector_store = VectorStore()
         self.ingestion_service = IngestionService()
         self.memory_service = MemoryService()
-        self.openai_client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        # Cliente async: las llamadas a OpenAI no bloquean el event loop.
+        # Pool de conexiones explicito compartido por todas las sesiones concurrentes
+        self.openai_client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+                timeout=httpx.Timeout(600.0, connect=5.0)
+            )
+        )
         self.conversation_memory: Dict[str, List[Dict]] = {}
         self.token_counter = TokenCounter(settings.OPENAI_MODEL)
         self.token_budget = TokenBudgetManager(settings.OPENAI_MODEL)
-        self.encoding = tiktoken.encoding_for_model(settings.OPENAI_MODEL)
         self.token_optimizer = TokenOptimizerService()
         self.adaptive_budget = AdaptiveBudgetService()
         self.enhanced_search = EnhancedVectorSearchService(self.vector_store)
         self.token_logger = TokenLoggerService()
         self.attachment_handler = AttachmentHandlerService()
+        # Textos de instrucciones/conocimiento compilados (ver _get_compiled)
+        self._compiled_cache: LRUCache = LRUCache(maxsize=256)
 
 
 
     async def generate_strategic_response_stream(
         self,
+        db: Session,
         message: str,
         session_id: str,
         user_id: int,
@@ -171,12 +205,11 @@ class ConversationService:
         Genera respuesta estrategica con streaming usando fuentes de conocimiento e instrucciones personalizadas
         Now supports file attachments (images and documents)
         """
-        print(f"[REFRESH] [DEBUG] Starting streaming response for session: {session_id}, user: {user_id}, require_analysis: {require_analysis}")
+        logger.debug("Starting streaming response for session: %s, user: %s, require_analysis: %s", session_id, user_id, require_analysis)
 
         is_simple_conversational = self._is_simple_conversational_message(message)
-        print(f"[CHAT] [DEBUG] Is simple conversational: {is_simple_conversational}")
+        logger.debug("Is simple conversational: %s", is_simple_conversational)
         
-        db = SessionLocal()
         try:
             from app.services.chat_service import ChatService
             from app.services.auth_service import AuthService
@@ -188,20 +221,14 @@ class ConversationService:
             user_company_data = await self._get_user_company_data(db, user_id)
             company_id = user_company_data.get('company_id')
 
-            if project_id:
-                project_knowledge = await self._get_project_knowledge(db, project_id)
-            else:
-                project_knowledge = []
-
+            # Se esperan en orden: comparten la sesion `db`, que no admite uso concurrente
+            project_knowledge = await self._get_project_knowledge(db, project_id)
             company_knowledge = await self._get_company_knowledge(db, company_id)
-            company_instructions = await self._get_company_instructions(db, user_id)
-            ai_config = await self._get_ai_configuration(db, company_id)
-            
             ai_config = await self._get_ai_configuration(db, company_id)
             
             # Standard configuration (replaces modes)
             max_tokens = 4000
-            print(f"[TOKEN] [DEBUG] Using standard max_tokens: {max_tokens}")
+            logger.debug("Using standard max_tokens: %s", max_tokens)
 
             if not is_simple_conversational:
                 # Search for relevant context
@@ -218,7 +245,8 @@ class ConversationService:
                 # The optimize_prompt method might need adjustments based on its actual implementation for streaming context optimization
                 # For now, we'll assume it returns compressed_context correctly.
                 # A more robust implementation might involve token budgeting for the entire stream.
-                _, _, compressed_context, _ = self.token_optimizer.optimize_prompt(
+                _, _, compressed_context, _ = await asyncio.to_thread(
+                    self.token_optimizer.optimize_prompt,
                     system_prompt="", # System prompt is built later, so it's empty here.
                     context=relevant_context,
                     history=[], # History is handled separately below.
@@ -227,7 +255,7 @@ class ConversationService:
                 )
                 relevant_context = compressed_context
             else:
-                print(f"[CHAT] [DEBUG] Simple conversational message detected, skipping document search")
+                logger.debug("Simple conversational message detected, skipping document search")
                 relevant_context = []
 
 
@@ -237,7 +265,8 @@ class ConversationService:
             else:
                 conversation_history = history_context
 
-            compressed_history = self.token_optimizer._compress_history(
+            compressed_history = await asyncio.to_thread(
+                self.token_optimizer._compress_history,
                 conversation_history,
                 settings.MAX_CONTEXT_LENGTH // 2
             )
@@ -245,17 +274,6 @@ class ConversationService:
 
             key_info = self.memory_service.extract_key_info(db, session_id, message)
 
-            # Extract company data for prompts
-            company_name = user_company_data.get('company_name', 'la empresa')
-            industry = user_company_data.get('industry', 'General')
-            
-            # Compile instructions and knowledge
-            instruction_text = self._compile_instructions(company_instructions) if company_instructions else "Responde de manera profesional y util."
-            knowledge_text = self._compile_knowledge(company_knowledge) if company_knowledge else "No hay conocimiento especifico disponible."
-            
-            # Project context
-            project_context = f"\n\nCONTEXTO DEL PROYECTO:\nEsta conversacion esta vinculada al proyecto ID {project_id}. Prioriza documentos del proyecto." if project_id else ""
-
             # Select Strategy
             from app.services.chat.strategies.advanced_strategy import AdvancedResponseStrategy
             from app.services.chat.strategies.medium_strategy import MediumResponseStrategy
@@ -263,110 +281,9 @@ class ConversationService:
 
             # Default to Medium Strategy (Standard)
             strategy = MediumResponseStrategy(self)
-            print(f"[REFRESH] [DEBUG] Using standard strategy: {type(strategy).__name__}")
-            print(f"[REFRESH] [DEBUG] Using strategy: {type(strategy).__name__}")
-
-            if is_simple_conversational:
-                system_prompt = f"""ERES UN ASISTENTE DE IA PERSONALIZADO PARA {company_name.upper()}.
-
-Responde de manera amigable, natural y profesional a los saludos y preguntas conversacionales del usuario.
-
-INFORMACION DE LA EMPRESA:
-- Empresa: {company_name}
-- Industria: {industry}
+            logger.debug("Using strategy: %s", type(strategy).__name__)
 
-Manten respuestas conversacionales, calidas y breves para saludos simples.
-"""
-                prompt = message
-                
-            elif require_analysis:
-                system_prompt = f"""ERES UN ASISTENTE DE IA PERSONALIZADO PARA {company_name.upper()}.{project_context}
-
-INSTRUCCIONES CRITICAS - DEBES SEGUIR AL PIE DE LA LETRA:
-{instruction_text}
-
-FUENTES DE CONOCIMIENTO PRIORITARIAS (USA ESTAS PRIMERO):
-{knowledge_text}
-
-INFORMACION DE LA EMPRESA:
-- Empresa: {company_name}
-- Industria: {industry}
-- Sector: {user_company_data.get('sector', '')}
-
-REGLAS ESTRICTAS:
-1. SIEMPRE sigue las instrucciones especificas proporcionadas
-2. USA PRIMERO el conocimiento de las fuentes prioritarias
-3. Si las fuentes no son suficientes, ENTONCES usa conocimiento general
-4. RECUERDA informacion de conversaciones anteriores
-5. ADAPTA tu respuesta al contexto especifico de {company_name}
-6. GENERA un ANALISIS CONCEPTUAL ESTRUCTURADO y un PLAN DE ACCION DETALLADO
-7. GENERA RESPUESTAS EXTENSAS Y DETALLADAS (minimo 1500 tokens)
-
-FORMATO REQUERIDO:
-## Analisis Conceptual
-[Analisis detallado del tema - SIGUE EXTENSE CON MULTIPLES PARRAFOS]
-
-## Plan de Accion
-[Plan estructurado con pasos especificos - DESARROLLA COMPLETAMENTE CADA PASO]
-"""
-                print(f"[ANALYSIS] [DEBUG] Building STRUCTURED analysis prompt (require_analysis=True)")
-                # Pass the compressed context and history to the prompt builder
-                prompt = self._build_enhanced_conversation_prompt(
-                    message, relevant_context, conversation_history, "conceptual", key_info, project_id
-                )
-            else:
-                system_prompt = f"""ERES UN ASISTENTE DE IA PERSONALIZADO PARA {company_name.upper()}.{project_context}
-
-INSTRUCCIONES CRITICAS - DEBES SEGUIR AL PIE DE LA LETRA:
-{instruction_text}
-
-FUENTES DE CONOCIMIENTO PRIORITARIAS (USA ESTAS PRIMERO):
-{knowledge_text}
-
-INFORMACION DE LA EMPRESA:
-- Empresa: {company_name}
-- Industria: {industry}
-- Sector: {user_company_data.get('sector', '')}
-
-REGLAS ESTRICTAS:
-1. SIEMPRE sigue las instrucciones especificas proporcionadas
-2. USA PRIMERO el conocimiento de las fuentes prioritarias
-3. Si las fuentes no son suficientes, ENTONCES usa conocimiento general
-4. RECUERDA informacion de conversaciones anteriores
-5. ADAPTA tu respuesta al contexto especifico de {company_name}
-6. GENERA RESPUESTAS EXTENSAS Y DETALLADAS (minimo 1500 tokens)
-7. Responde de manera CONVERSACIONAL pero COMPLETA Y PROFUNDA
-
-Manten respuestas detalladas, informativas y conversacionales - NO hagas respuestas cortas.
-"""
-                print(f"[CHAT] [DEBUG] Building NORMAL conversation prompt (require_analysis=False)")
-                # Pass the compressed context and history to the prompt builder
-                prompt = self._build_normal_conversation_prompt(
-                    message, relevant_context, conversation_history, key_info, project_id
-                )
-
-            model_name = ai_config.model_name if ai_config else settings.OPENAI_MODEL
-            temperature = float(ai_config.temperature) if ai_config else settings.DEFAULT_TEMPERATURE
-            max_tokens = ai_config.max_tokens if ai_config else settings.MAX_RESPONSE_TOKENS
-
-            if temperature < settings.DEFAULT_TEMPERATURE:
-                temperature = settings.DEFAULT_TEMPERATURE
-
-            # Stream the response from OpenAI
-            stream = self.openai_client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=max_tokens,
-                temperature=temperature,
-                top_p=settings.DEFAULT_TOP_P,
-                stream=True  # Enable streaming
-            )
-
-            response_content = ""
-            token_count = 0
+            # La estrategia construye sus propios prompts y emite la llamada en streaming a OpenAI
             full_response = ""
             start_time = datetime.now()
             
@@ -380,7 +297,7 @@ Manten respuestas detalladas, informativas y conversacionales - NO hagas respues
             # Log tokens after streaming completes
             end_time = datetime.now()
             response_time = (end_time - start_time).total_seconds()
-            estimated_tokens = self.token_counter.count_tokens(full_response)
+            estimated_tokens = await asyncio.to_thread(self.token_counter.count_tokens, full_response)
             
             self.token_logger.log_streaming_tokens(
                 session_id=session_id,
@@ -393,10 +310,10 @@ Manten respuestas detalladas, informativas y conversacionales - NO hagas respues
             )
 
         except Exception as e:
-            print(f"[ERR] [DEBUG] Error in streaming response: {e}")
+            logger.error("Error in streaming response: %s", e)
+            # La sesion es la de la peticion: dejarla utilizable para quien la comparte
+            db.rollback()
             yield f"\n\nError generando respuesta: {str(e)}"
-        finally:
-            db.close()
 
     def _build_system_prompt(
         self,
@@ -444,7 +361,7 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
 
 
 
-    async def analyze_ambiguity(self, message: str, user_id: int = None) -> bool:
+    async def analyze_ambiguity(self, db: Session, message: str, user_id: int = None) -> bool:
         """
         Analiza si un mensaje es ambiguo usando instrucciones personalizadas por compania
         """
@@ -455,37 +372,49 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         if any(message_lower.startswith(greet) for greet in greetings) and len(message.split()) < 6:
             return False
 
-        db = SessionLocal()
-        try:
-            company_instructions = await self._get_company_instructions(db, user_id)
+        company_instructions = await self._get_company_instructions(db, user_id)
 
-            if company_instructions:
-                return await self._analyze_ambiguity_with_instructions(message, company_instructions)
+        if company_instructions:
+            return await self._analyze_ambiguity_with_instructions(message, company_instructions)
 
-            # Fallback to original logic
-            if len(message.split()) < 4:
-                return True
+        # Fallback to original logic
+        if len(message.split()) < 4:
+            return True
 
-            ambiguity_keywords = [
-                'estrategia', 'negocio', 'software', 'empresa', 'startup',
-                'que hacer', 'consejo', 'recomendacion', 'idea'
-            ]
+        ambiguity_keywords = [
+            'estrategia', 'negocio', 'software', 'empresa', 'startup',
+            'que hacer', 'consejo', 'recomendacion', 'idea'
+        ]
 
-            message_lower = message.lower()
-            has_ambiguity_keywords = any(keyword in message_lower for keyword in ambiguity_keywords)
+        message_lower = message.lower()
+        has_ambiguity_keywords = any(keyword in message_lower for keyword in ambiguity_keywords)
 
-            if len(message.split()) < 8 and has_ambiguity_keywords:
-                return True
-
-            return len(message.split()) < 5
+        if len(message.split()) < 8 and has_ambiguity_keywords:
+            return True
 
-        finally:
-            db.close()
+        return len(message.split()) < 5
 
     async def _analyze_ambiguity_with_instructions(self, message: str, instructions: List[Dict]) -> bool:
         """
         Analiza ambigedad usando instrucciones especificas de la compania
         """
+        try:
+            api_args = self._ambiguity_request(message, instructions)
+
+            # Adjust max_tokens and temperature for precision
+            response = await self.openai_client.chat.completions.create(**api_args)
+
+            result = response.choices[0].message.content.strip().lower()
+            return result == "true"
+
+        except Exception as e:
+            logger.error("Error analizando ambigedad con instrucciones: %s", e)
+            return len(message.split()) < 5
+
+    def _ambiguity_request(self, message: str, instructions: List[Dict]) -> Dict[str, Any]:
+        """
+        Cuerpo de la llamada de analisis de ambiguedad; el mismo para la API en vivo y la Batch API
+        """
         instruction_text = self._compile_instructions(instructions)
 
         prompt = f"""
@@ -500,40 +429,89 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         Consulta del usuario: "{message}"
         """
 
-        try:
-            api_args = {
-                "model": settings.OPENAI_MODEL,
-                "messages": [{"role": "system", "content": "Sigues estrictamente las instrucciones proporcionadas para determinar si una consulta necesita clarificacion."}, {"role": "user", "content": prompt}],
-                "max_tokens": 10, # Limit tokens for a simple True/False response
-                "temperature": 0.1 # Low temperature for deterministic output
-            }
+        return {
+            "model": settings.OPENAI_MODEL,
+            "messages": [{"role": "system", "content": "Sigues estrictamente las instrucciones proporcionadas para determinar si una consulta necesita clarificacion."}, {"role": "user", "content": prompt}],
+            "max_tokens": 10, # Limit tokens for a simple True/False response
+            "temperature": 0.1 # Low temperature for deterministic output
+        }
 
-            # Adjust max_tokens and temperature for precision
-            response = self.openai_client.chat.completions.create(**api_args)
+    async def submit_batch_ambiguity(self, db: Session, messages: List[str], user_id: int) -> Dict[str, Any]:
+        """
+        Envia el analisis de ambiguedad de muchos mensajes a la Batch API de OpenAI.
+        Para cargas masivas o evaluaciones: mitad de costo y cupo de rate limit propio,
+        con resultado dentro de 24 h. Devuelve el batch_id y su estado inicial.
+        """
+        company_instructions = await self._get_company_instructions(db, user_id)
+        if not company_instructions:
+            # Sin instrucciones la ambiguedad se resuelve con heuristicas locales, sin llamar al modelo
+            raise ValueError("La compania del usuario no tiene instrucciones configuradas")
+
+        lines = [
+            json.dumps({
+                "custom_id": f"msg-{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._ambiguity_request(message, company_instructions)
+            })
+            for i, message in enumerate(messages)
+        ]
+        batch_file = await self.openai_client.files.create(
+            file=("ambiguity_batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch"
+        )
+        batch = await self.openai_client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info("Ambiguity batch %s submitted with %s messages", batch.id, len(messages))
+        return {"batch_id": batch.id, "status": batch.status, "results": None}
 
-            result = response.choices[0].message.content.strip().lower()
-            return result == "true"
+    async def get_batch_ambiguity_results(self, batch_id: str) -> Dict[str, Any]:
+        """
+        Estado de un lote de ambiguedad; al completarse incluye un resultado por mensaje
+        en el orden enviado (None para los mensajes que fallaron)
+        """
+        batch = await self.openai_client.batches.retrieve(batch_id)
+        if batch.status != "completed" or not batch.output_file_id:
+            return {"batch_id": batch_id, "status": batch.status, "results": None}
 
-        except Exception as e:
-            print(f"[ERR] Error analizando ambigedad con instrucciones: {e}")
-            return len(message.split()) < 5
+        output = await self.openai_client.files.content(batch.output_file_id)
+        answers: Dict[int, bool] = {}
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if response.get("status_code") == 200:
+                content = response["body"]["choices"][0]["message"]["content"] or ""
+                answers[int(item["custom_id"].split("-", 1)[1])] = content.strip().lower() == "true"
 
-    async def generate_clarification_questions(self, message: str, user_id: int = None) -> List[ClarificationQuestion]:
+        results = [answers.get(i) for i in range(batch.request_counts.total)]
+        return {"batch_id": batch_id, "status": batch.status, "results": results}
+
+    async def wait_for_batch(self, batch_id: str, poll_interval: float = 60.0) -> str:
         """
-        Genera preguntas de clarificacion usando instrucciones personalizadas
+        Espera a que un lote llegue a un estado final (para scripts y backfills) y lo devuelve
         """
-        db = SessionLocal()
-        try:
-            company_instructions = await self._get_company_instructions(db, user_id)
+        while True:
+            batch = await self.openai_client.batches.retrieve(batch_id)
+            if batch.status in ("completed", "failed", "expired", "cancelled"):
+                return batch.status
+            await asyncio.sleep(poll_interval)
 
-            if company_instructions:
-                return await self._generate_clarification_with_instructions(message, company_instructions)
+    async def generate_clarification_questions(self, db: Session, message: str, user_id: int = None) -> List[ClarificationQuestion]:
+        """
+        Genera preguntas de clarificacion usando instrucciones personalizadas
+        """
+        company_instructions = await self._get_company_instructions(db, user_id)
 
-            # Fallback to original logic
-            return await self._generate_default_clarification(message)
+        if company_instructions:
+            return await self._generate_clarification_with_instructions(message, company_instructions)
 
-        finally:
-            db.close()
+        # Fallback to original logic
+        return await self._generate_default_clarification(message)
 
     async def _generate_clarification_with_instructions(self, message: str, instructions: List[Dict]) -> List[ClarificationQuestion]:
         """
@@ -565,18 +543,19 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
             }
 
             # Adjust max_tokens and temperature for better clarification generation
-            response = self.openai_client.chat.completions.create(**api_args)
+            response = await self.openai_client.chat.completions.create(**api_args)
 
             content = response.choices[0].message.content
             questions = self._parse_clarification_questions(content)
             return questions[:3]
 
         except Exception as e:
-            print(f"[ERR] Error generando clarificacion con instrucciones: {e}")
+            logger.error("Error generando clarificacion con instrucciones: %s", e)
             return await self._generate_default_clarification(message)
 
     async def generate_strategic_response(
         self,
+        db: Session,
         message: str,
         session_id: str,
         user_id: int,
@@ -589,16 +568,15 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         Genera respuesta estrategica con presupuesto adaptativo de tokens
         Si require_analysis es False, genera una respuesta normal sin estructura de analisis/plan
         """
-        print(f"[REFRESH] [DEBUG] Starting generate_strategic_response")
+        logger.debug("Starting generate_strategic_response")
 
         if attachments:
             if self.attachment_handler.validate_attachments(attachments):
-                print(f"[ATTACH] [DEBUG] {len(attachments)} valid attachments received")
+                logger.debug("%s valid attachments received", len(attachments))
             else:
-                print(f"[WARN] [DEBUG] Some attachments have invalid structure")
+                logger.warning("Some attachments have invalid structure")
                 attachments = None
 
-        db = SessionLocal()
         try:
             from app.services.chat_service import ChatService
             from app.services.auth_service import AuthService
@@ -607,37 +585,70 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
             conversation = ChatService().get_conversation_by_session_id(db, current_user, session_id)
             project_id = conversation.project_id if conversation else None
 
-            print(f"[SEARCH] [DEBUG] Conversation project_id: {project_id}")
+            logger.debug("Conversation project_id: %s", project_id)
 
             user_company_data = await self._get_user_company_data(db, user_id)
             company_id = user_company_data.get('company_id')
 
-            if project_id:
-                print(f"[FOLDER] [DEBUG] Fetching project-specific documents for project {project_id}")
-                project_knowledge = await self._get_project_knowledge(db, project_id)
-                print(f"[OK] [DEBUG] Project knowledge loaded: {len(project_knowledge)} documents")
-            else:
-                project_knowledge = []
-
+            # Se esperan en orden: comparten la sesion `db`, que no admite uso concurrente
+            project_knowledge = await self._get_project_knowledge(db, project_id)
             company_knowledge = await self._get_company_knowledge(db, company_id)
-            company_instructions = await self._get_company_instructions(db, user_id)
+            company_instructions = await self._get_company_instructions(db, user_id, company_id=company_id)
             ai_config = await self._get_ai_configuration(db, company_id)
+            if project_id:
+                logger.debug("Project knowledge loaded: %s documents", len(project_knowledge))
 
-            print(f"[OK] [DEBUG] Company data loaded: {len(company_knowledge)} knowledge docs, {len(company_instructions)} instruction docs")
+            logger.debug("Company data loaded: %s knowledge docs, %s instruction docs", len(company_knowledge), len(company_instructions))
 
             # Add message to memory
             try:
                 self.memory_service.add_message(db, session_id, "user", message)
-                print(f"[OK] [DEBUG] User message added to memory")
+                logger.debug("User message added to memory")
             except Exception as e:
-                print(f"[ERR] [DEBUG] Error adding message to memory: {e}")
+                logger.error("Error adding message to memory: %s", e)
 
             if history_context is None:
                 full_context = self.memory_service.get_full_context_for_ai(db, session_id, memory_limit=200)
                 conversation_history = full_context.get("messages", [])
             else:
                 conversation_history = history_context
-            
+
+            # Cache semantico: solo primer mensaje sin adjuntos ni proyecto, donde
+            # la respuesta depende unicamente de la compania y de la consulta
+            cache_mode = "analysis" if require_analysis else "normal"
+            use_response_cache = (
+                settings.SEMANTIC_CACHE_ENABLED
+                and company_id is not None
+                and not attachments
+                and not project_id
+                and len(conversation_history) <= 1
+            )
+            cached = None
+            if use_response_cache:
+                cached = semantic_response_cache.get_exact(company_id, cache_mode, message)
+
+            # Un solo embedding del mensaje por turno: lo comparten el cache
+            # semantico y las busquedas vectoriales de proyecto y compania
+            message_embedding = None
+            if cached is None and (use_response_cache or company_id or project_id):
+                message_embedding = await self._embed_query(message)
+
+            if use_response_cache:
+                if cached is None and message_embedding is not None:
+                    cached = semantic_response_cache.get_similar(company_id, cache_mode, message_embedding)
+                if cached is not None:
+                    conceptual, accional = cached
+                    cached_text = (
+                        f"## Analisis Conceptual\n{conceptual.content}\n\n## Plan de Accion\n{accional.content}"
+                        if require_analysis else conceptual.content
+                    )
+                    try:
+                        self.memory_service.add_message(db, session_id, "assistant", cached_text)
+                    except Exception as e:
+                        logger.error("Error adding assistant response to memory: %s", e)
+                    logger.debug("Semantic cache hit, OpenAI generation skipped")
+                    return conceptual, accional
+
             # Calcular presupuesto adaptativo
             adaptive_budget = self.adaptive_budget.calculate_adaptive_budget(
                 message=message,
@@ -646,11 +657,13 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                 require_analysis=require_analysis
             )
             
-            print(f"[STATS] [DEBUG] Adaptive budget calculated:")
-            print(f"   - Complexity: {adaptive_budget['complexity_level']} (factor: {adaptive_budget['complexity_factor']})")
-            print(f"   - Response tokens: {adaptive_budget['response_tokens']}")
-            print(f"   - Context tokens: {adaptive_budget['context_tokens']}")
-            print(f"   - Total allocated: {adaptive_budget['total_allocated']}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Adaptive budget: complexity=%s (factor %s) response=%s context=%s total=%s",
+                    adaptive_budget['complexity_level'], adaptive_budget['complexity_factor'],
+                    adaptive_budget['response_tokens'], adaptive_budget['context_tokens'],
+                    adaptive_budget['total_allocated']
+                )
 
             # Usar presupuesto adaptativo en token optimizer
             # Usar _search_prioritized_context que ahora usa enhanced_search
@@ -659,33 +672,37 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                 company_knowledge,
                 project_knowledge,
                 company_id=company_id,
-                project_id=project_id
+                project_id=project_id,
+                query_embedding=message_embedding
             )
 
-            compressed_context = self.token_optimizer.compress_context(
+            # Tokenizar el contexto es CPU puro: fuera del event loop
+            compressed_context = await asyncio.to_thread(
+                self.token_optimizer.compress_context,
                 relevant_context,
                 adaptive_budget['context_tokens']
             )
             relevant_context = compressed_context
 
-            print(f"[OK] [DEBUG] Prioritized context search completed: {len(relevant_context)} results")
+            logger.debug("Prioritized context search completed: %s results", len(relevant_context))
 
             # Get conversation history
             try:
                 if history_context is None:
                     full_context = self.memory_service.get_full_context_for_ai(db, session_id, memory_limit=200)
                     conversation_history = full_context.get("messages", [])
-                    print(f"[OK] [DEBUG] Fetched conversation context: {len(conversation_history)} messages")
+                    logger.debug("Fetched conversation context: %s messages", len(conversation_history))
                 else:
                     conversation_history = history_context
 
                 key_info = self.memory_service.extract_key_info(db, session_id, message)
-                print(f"[OK] [DEBUG] Memory retrieval completed")
+                logger.debug("Memory retrieval completed")
             except Exception as e:
-                print(f"[ERR] [DEBUG] Error retrieving memory: {e}")
+                logger.error("Error retrieving memory: %s", e)
                 conversation_history = history_context or []
                 key_info = {}
 
+            response_ok = True
             if require_analysis:
                 # Generate structured analysis and action plan
                 try:
@@ -695,9 +712,10 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                         project_id=project_id,
                         attachments=attachments  # Pass attachments
                     )
-                    print(f"[OK] [DEBUG] Conceptual response generated with instructions")
+                    logger.debug("Conceptual response generated with instructions")
                 except Exception as e:
-                    print(f"[ERR] [DEBUG] Error generating conceptual response: {e}")
+                    logger.error("Error generating conceptual response: %s", e)
+                    response_ok = False
                     conceptual = ConceptualResponse(
                         content="Error generando respuesta conceptual. Intenta nuevamente.",
                         sources=[],
@@ -709,9 +727,10 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                         message, relevant_context, conceptual.content,
                         company_instructions, ai_config
                     )
-                    print(f"[OK] [DEBUG] Accional response generated with instructions")
+                    logger.debug("Accional response generated with instructions")
                 except Exception as e:
-                    print(f"[ERR] [DEBUG] Error generating accional response: {e}")
+                    logger.error("Error generating accional response: %s", e)
+                    response_ok = False
                     accional = AccionalResponse(
                         content="Error generando plan de accion. Intenta nuevamente.",
                         priority="media",
@@ -724,7 +743,7 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                     self.memory_service.add_message(db, session_id, "assistant", full_response)
                     
                     response_length = len(full_response)
-                    estimated_tokens = self.token_counter.count_tokens(full_response)
+                    estimated_tokens = await asyncio.to_thread(self.token_counter.count_tokens, full_response)
                     self.token_logger.log_streaming_tokens(
                         session_id=session_id,
                         user_id=user_id,
@@ -735,9 +754,9 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                         response_time=0
                     )
                     
-                    print(f"[OK] [DEBUG] Assistant response added to memory")
+                    logger.debug("Assistant response added to memory")
                 except Exception as e:
-                    print(f"[ERR] [DEBUG] Error adding assistant response to memory: {e}")
+                    logger.error("Error adding assistant response to memory: %s", e)
             else:
                 # Generate normal conversational response without structured analysis
                 try:
@@ -747,7 +766,7 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                         project_id=project_id,
                         attachments=attachments  # Pass attachments
                     )
-                    print(f"[OK] [DEBUG] Normal response generated")
+                    logger.debug("Normal response generated")
                     
                     # Wrap normal response in expected format
                     conceptual = ConceptualResponse(
@@ -768,7 +787,7 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                         self.memory_service.add_message(db, session_id, "assistant", normal_response)
                         
                         response_length = len(normal_response)
-                        estimated_tokens = self.token_counter.count_tokens(normal_response)
+                        estimated_tokens = await asyncio.to_thread(self.token_counter.count_tokens, normal_response)
                         self.token_logger.log_streaming_tokens(
                             session_id=session_id,
                             user_id=user_id,
@@ -779,12 +798,13 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                             response_time=0
                         )
                         
-                        print(f"[OK] [DEBUG] Normal assistant response added to memory")
+                        logger.debug("Normal assistant response added to memory")
                     except Exception as e:
-                        print(f"[ERR] [DEBUG] Error adding assistant response to memory: {e}")
+                        logger.error("Error adding assistant response to memory: %s", e)
                         
                 except Exception as e:
-                    print(f"[ERR] [DEBUG] Error generating normal response: {e}")
+                    logger.error("Error generating normal response: %s", e)
+                    response_ok = False
                     conceptual = ConceptualResponse(
                         content="Error generando respuesta. Intenta nuevamente.",
                         sources=[],
@@ -796,14 +816,19 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                         timeline=""
                     )
 
-            print(f"[OK] [DEBUG] generate_strategic_response completed successfully")
+            if use_response_cache and response_ok and message_embedding is not None:
+                semantic_response_cache.store(
+                    company_id, cache_mode, message, message_embedding, (conceptual, accional)
+                )
+
+            logger.debug("generate_strategic_response completed successfully")
             return conceptual, accional
 
         except Exception as e:
-            print(f"[ERR] [DEBUG] Unexpected error in generate_strategic_response: {e}")
+            logger.error("Unexpected error in generate_strategic_response: %s", e)
+            # La sesion es la de la peticion: dejarla utilizable para quien la comparte
+            db.rollback()
             return await self._generate_fallback_responses(message)
-        finally:
-            db.close()
 
     async def _get_user_company_data(self, db: Session, user_id: int) -> Dict[str, Any]:
         """
@@ -823,7 +848,7 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                 }
             return {}
         except Exception as e:
-            print(f"[ERR] Error getting user company data: {e}")
+            logger.error("Error getting user company data: %s", e)
             return {}
 
     async def _get_company_knowledge(self, db: Session, company_id: int) -> List[Dict[str, Any]]:
@@ -833,15 +858,25 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         if not company_id:
             return []
 
+        cache_key = ("knowledge", company_id)
+        with company_cache_lock:
+            cached = company_prompt_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
             from app.services.company_service import CompanyDocumentService
             knowledge_docs = CompanyDocumentService.get_documents_by_priority(
                 db, company_id, DocumentCategory.KNOWLEDGE_BASE, max_priority=10
             )
 
+            # Leer todos los archivos en paralelo; gather conserva el orden por prioridad
+            contents = await asyncio.gather(
+                *(CompanyDocumentService.read_document_file_async(doc) for doc in knowledge_docs)
+            )
+
             knowledge_content = []
-            for doc in knowledge_docs:
-                content = CompanyDocumentService.get_document_content(db, company_id, doc.id)
+            for doc, content in zip(knowledge_docs, contents):
                 if content:
                     knowledge_content.append({
                         "filename": doc.filename,
@@ -851,23 +886,38 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                         "category": "knowledge_base"
                     })
 
+            with company_cache_lock:
+                company_prompt_cache[cache_key] = knowledge_content
             return knowledge_content
         except Exception as e:
-            print(f"[ERR] Error getting company knowledge: {e}")
+            logger.error("Error getting company knowledge: %s", e)
             return []
 
-    async def _get_company_instructions(self, db: Session, user_id: int) -> List[Dict[str, Any]]:
+    async def _get_company_instructions(
+        self,
+        db: Session,
+        user_id: int,
+        company_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
         Obtiene documentos de instrucciones de la compania del usuario.
         Soporta PROTOCOLOS CENTRALIZADOS: si use_protocol=True, carga desde Protocol table.
+        Si el llamador ya conoce company_id no se vuelve a consultar el usuario.
         """
         try:
-            user_data = await self._get_user_company_data(db, user_id)
-            company_id = user_data.get('company_id')
+            if company_id is None:
+                user_data = await self._get_user_company_data(db, user_id)
+                company_id = user_data.get('company_id')
 
             if not company_id:
                 return []
 
+            cache_key = ("instructions", company_id)
+            with company_cache_lock:
+                cached = company_prompt_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
             from app.services.company_service import CompanyDocumentService
             from app.models.protocol import Protocol
             
@@ -875,15 +925,33 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                 db, company_id, DocumentCategory.INSTRUCTIONS, max_priority=10
             )
 
+            # Los documentos basados en archivo se leen en paralelo antes de armar la lista
+            file_docs = [doc for doc in instruction_docs if not (doc.use_protocol and doc.protocol_id)]
+            file_contents = dict(zip(
+                (doc.id for doc in file_docs),
+                await asyncio.gather(
+                    *(CompanyDocumentService.read_document_file_async(doc) for doc in file_docs)
+                )
+            ))
+
+            # Todos los protocolos referenciados en una sola consulta
+            protocol_ids = {doc.protocol_id for doc in instruction_docs if doc.use_protocol and doc.protocol_id}
+            protocols = {}
+            if protocol_ids:
+                protocols = {
+                    protocol.id: protocol
+                    for protocol in db.query(Protocol).filter(
+                        Protocol.id.in_(protocol_ids),
+                        Protocol.is_active == True
+                    )
+                }
+
             instructions_content = []
             for doc in instruction_docs:
                 # Verificar si usa protocolo centralizado
                 if doc.use_protocol and doc.protocol_id:
                     # Cargar desde PROTOCOLO
-                    protocol = db.query(Protocol).filter(
-                        Protocol.id == doc.protocol_id,
-                        Protocol.is_active == True
-                    ).first()
+                    protocol = protocols.get(doc.protocol_id)
                     
                     if protocol:
                         instructions_content.append({
@@ -897,12 +965,12 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                             "protocol_name": protocol.name,
                             "protocol_version": protocol.version
                         })
-                        print(f"[DOC] [PROTOCOL] Loaded protocol '{protocol.name}' for doc {doc.id}")
+                        logger.debug("Loaded protocol '%s' for doc %s", protocol.name, doc.id)
                     else:
-                        print(f"[WARN] [PROTOCOL] Protocol ID {doc.protocol_id} not found or inactive for doc {doc.id}")
+                        logger.warning("Protocol ID %s not found or inactive for doc %s", doc.protocol_id, doc.id)
                 else:
                     # Cargar desde ARCHIVO (sistema actual)
-                    content = CompanyDocumentService.get_document_content(db, company_id, doc.id)
+                    content = file_contents.get(doc.id)
                     if content:
                         instructions_content.append({
                             "filename": doc.filename,
@@ -913,10 +981,12 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                             "source": "file"
                         })
 
-            print(f"[KNOWLEDGE] [DEBUG] Loaded {len(instructions_content)} instruction documents (protocols + files)")
+            logger.debug("Loaded %s instruction documents (protocols + files)", len(instructions_content))
+            with company_cache_lock:
+                company_prompt_cache[cache_key] = instructions_content
             return instructions_content
         except Exception as e:
-            print(f"[ERR] Error getting company instructions: {e}")
+            logger.error("Error getting company instructions: %s", e)
             return []
 
     async def _get_ai_configuration(self, db: Session, company_id: int) -> Optional[Any]:
@@ -930,7 +1000,7 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
             from app.services.ai_configuration_service import AIConfigurationService
             return AIConfigurationService.get_by_company_id(db, company_id)
         except Exception as e:
-            print(f"[ERR] Error getting AI configuration: {e}")
+            logger.error("Error getting AI configuration: %s", e)
             return None
 
     async def _get_project_knowledge(self, db: Session, project_id: int) -> List[Dict[str, Any]]:
@@ -962,10 +1032,10 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                         "file_category": file.category.value
                     })
 
-            print(f"[FOLDER] [DEBUG] Loaded {len(project_content)} project files")
+            logger.debug("Loaded %s project files", len(project_content))
             return project_content
         except Exception as e:
-            print(f"[ERR] Error getting project knowledge: {e}")
+            logger.error("Error getting project knowledge: %s", e)
             return []
 
 
@@ -975,7 +1045,8 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         company_knowledge: List[Dict],
         project_knowledge: List[Dict],
         company_id: int = None,
-        project_id: int = None
+        project_id: int = None,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """
         Busca contexto usando busqueda vectorial mejorada con multiples estrategias
@@ -983,21 +1054,26 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         """
         prioritized_context = []
 
+        # Ambas busquedas usan el mismo embedding de la consulta
+        if query_embedding is None and (project_id or company_id):
+            query_embedding = await self._embed_query(message)
+
         try:
             if not hasattr(self.vector_store, 'store') or self.vector_store.store.index is None:
                 await self.vector_store.initialize()
 
             if project_id:
-                print(f"[SEARCH] [DEBUG] Searching PROJECT documents with enhanced search for project {project_id}")
+                logger.debug("Searching PROJECT documents with enhanced search for project %s", project_id)
                 try:
                     project_results = await self.enhanced_search.hybrid_search(
                         message,
                         project_id=project_id,
                         top_k=30,  # Increased from 20 to 30
-                        min_score=0.25  # Lowered from 0.3 to 0.25 for better coverage
+                        min_score=0.25,  # Lowered from 0.3 to 0.25 for better coverage
+                        query_embedding=query_embedding
                     )
 
-                    print(f"[FOLDER] [DEBUG] Enhanced search found {len(project_results)} relevant project documents")
+                    logger.debug("Enhanced search found %s relevant project documents", len(project_results))
 
                     # Add project results with HIGHEST priority
                     for result in project_results:
@@ -1013,22 +1089,23 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                             'relevance_score': score
                         })
 
-                    print(f"[OK] [DEBUG] Added {len(project_results)} documents from enhanced PROJECT search")
+                    logger.debug("Added %s documents from enhanced PROJECT search", len(project_results))
                 
                 except Exception as e:
-                    print(f"[WARN] [DEBUG] Error in project search (continuing anyway): {e}")
+                    logger.warning("Error in project search (continuing anyway): %s", e)
 
             if company_id:
-                print(f"[SEARCH] [DEBUG] Searching COMPANY documents with enhanced search for company {company_id}")
+                logger.debug("Searching COMPANY documents with enhanced search for company %s", company_id)
                 try:
                     company_results = await self.enhanced_search.hybrid_search(
                         message,
                         company_id=company_id,
                         top_k=25,  # Increased from 15 to 25
-                        min_score=0.25  # Lowered from 0.3 to 0.25 for better coverage
+                        min_score=0.25,  # Lowered from 0.3 to 0.25 for better coverage
+                        query_embedding=query_embedding
                     )
 
-                    print(f" [DEBUG] Enhanced search found {len(company_results)} relevant company documents")
+                    logger.debug("Enhanced search found %s relevant company documents", len(company_results))
 
                     # Add company results with lower priority than project
                     for result in company_results:
@@ -1044,46 +1121,69 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                             'relevance_score': score
                         })
 
-                    print(f"[OK] [DEBUG] Added {len(company_results)} documents from enhanced COMPANY search")
+                    logger.debug("Added %s documents from enhanced COMPANY search", len(company_results))
                 
                 except Exception as e:
-                    print(f"[WARN] [DEBUG] Error in company search (continuing anyway): {e}")
+                    logger.warning("Error in company search (continuing anyway): %s", e)
 
         except Exception as e:
-            print(f"[WARN] [DEBUG] Error in enhanced vector search initialization: {e}")
+            logger.warning("Error in enhanced vector search initialization: %s", e)
+
+        # Contenidos ya agregados: pertenencia O(1) en lugar de comparar contra cada resultado
+        seen_contents = {ctx.get('content') for ctx in prioritized_context}
 
         # Add project knowledge files (not from vector search)
         for doc in project_knowledge:
             content = doc.get('content', '')
             # Only add if not already in vector results
-            if not any(ctx.get('content') == content for ctx in prioritized_context):
+            if content not in seen_contents:
+                seen_contents.add(content[:3000])
                 prioritized_context.append({
                     'content': content[:3000],  # Increased from 2500 to 3000
                     'source': f"proyecto_{doc['filename']}",
                     'priority': 0,  # High priority for project files
-                    'category': 'project_knowledge'
+                    'category': 'project_knowledge',
+                    'relevance_score': 0.0
                 })
 
         # Add company knowledge files
         for doc in company_knowledge:
             content = doc.get('content', '')
             # Only add if not already in results
-            if not any(ctx.get('content') == content for ctx in prioritized_context):
+            if content not in seen_contents:
+                seen_contents.add(content[:3000])
                 prioritized_context.append({
                     'content': content[:3000],  # Increased from 2500 to 3000
                     'source': f"conocimiento_{doc['filename']}",
                     'priority': doc.get('priority', 5),
-                    'category': 'company_knowledge'
+                    'category': 'company_knowledge',
+                    'relevance_score': 0.0
                 })
 
-        prioritized_context.sort(key=lambda x: (x.get('priority', 5), -x.get('relevance_score', 0.0)))
+        logger.debug("Total context documents: %s", len(prioritized_context))
 
-        print(f"[STATS] [DEBUG] Total context documents: {len(prioritized_context)}")
-        if project_id:
+        # Solo se conservan los 30 primeros: seleccion parcial en lugar de ordenar todo
+        prioritized_context = heapq.nsmallest(30, prioritized_context, key=_context_rank)
+        if project_id and logger.isEnabledFor(logging.DEBUG):
             project_docs = [ctx for ctx in prioritized_context if 'project' in ctx.get('category', '')]
-            print(f"[FOLDER] [DEBUG] Project documents in context: {len(project_docs)}")
+            logger.debug("Project documents in context: %s", len(project_docs))
+
+        return prioritized_context
 
-        return prioritized_context[:30]
+    async def _embed_query(self, message: str) -> Optional[List[float]]:
+        """
+        Embedding del mensaje con el mismo modelo que el vector store.
+        Devuelve None si falla; cada busqueda calcula entonces el suyo.
+        """
+        try:
+            response = await self.openai_client.embeddings.create(
+                model=settings.EMBEDDING_MODEL,
+                input=[message]
+            )
+            return response.data[0].embedding
+        except Exception as e:
+            logger.warning("Query embedding failed: %s", e)
+            return None
 
     def _is_simple_conversational_message(self, message: str) -> bool:
         """
@@ -1117,17 +1217,6 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         
         return False
 
-    def _is_content_relevant(self, message: str, content: str) -> bool:
-        """
-        Determina si el contenido es relevante para el mensaje
-        """
-        message_words = set(message.lower().split())
-        content_words = set(content.lower().split())
-
-        # Simple relevance check based on word overlap
-        overlap = len(message_words.intersection(content_words))
-        return overlap >= 2 or len(message_words.intersection(content_words)) / len(message_words) > 0.2
-
     def _compile_instructions(self, instructions: List[Dict]) -> str:
         """
         Compila las instrucciones en un texto coherente
@@ -1135,17 +1224,36 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         if not instructions:
             return "No hay instrucciones especificas configuradas."
 
-        compiled = "INSTRUCCIONES ESPECIFICAS A SEGUIR AL PIE DE LA LETRA:\n\n"
+        cached = self._get_compiled("instructions", instructions)
+        if cached is not None:
+            return cached
+
+        parts = ["INSTRUCCIONES ESPECIFICAS A SEGUIR AL PIE DE LA LETRA:\n\n"]
 
         for i, instruction in enumerate(instructions, 1):
             priority = instruction.get('priority', 5)
             filename = instruction.get('filename', f'instruccion_{i}')
             content = instruction.get('content', '')
 
-            compiled += f"## INSTRUCCION {i} (Prioridad {priority}) - {filename}\n"
-            compiled += f"{content}\n\n"
+            parts.append(f"## INSTRUCCION {i} (Prioridad {priority}) - {filename}\n{content}\n\n")
 
-        compiled += "\nDEBES SEGUIR ESTAS INSTRUCCIONES EXACTAMENTE COMO ESTAN ESCRITAS."
+        parts.append("\nDEBES SEGUIR ESTAS INSTRUCCIONES EXACTAMENTE COMO ESTAN ESCRITAS.")
+        return self._set_compiled("instructions", instructions, "".join(parts))
+
+    def _get_compiled(self, kind: str, docs: List[Dict]) -> Optional[str]:
+        """
+        Texto ya compilado para esta lista de documentos.
+        Las listas de compania vienen de company_prompt_cache: mientras no se
+        invalidan son el mismo objeto, asi que su identidad sirve de version.
+        """
+        entry = self._compiled_cache.get((kind, id(docs)))
+        if entry is not None and entry[0] is docs:
+            return entry[1]
+        return None
+
+    def _set_compiled(self, kind: str, docs: List[Dict], compiled: str) -> str:
+        # Se guarda la lista junto al texto: mientras la entrada exista su id no se reutiliza
+        self._compiled_cache[(kind, id(docs))] = (docs, compiled)
         return compiled
 
 
@@ -1193,7 +1301,9 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         model_name = ai_config.model_name if ai_config else settings.OPENAI_MODEL
         temperature = float(ai_config.temperature) if ai_config else 0.7
         # Use budget manager for max_tokens for action plans
-        budget_info = self.token_budget.validate_and_adjust_tokens(system_prompt, prompt, response_mode="advanced") # Assuming action plans are advanced
+        budget_info = await asyncio.to_thread(
+            self.token_budget.validate_and_adjust_tokens, system_prompt, prompt, response_mode="advanced"
+        ) # Assuming action plans are advanced
         max_tokens = budget_info["max_tokens"]
 
         try:
@@ -1204,7 +1314,7 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                 "temperature": temperature
             }
 
-            response = self.openai_client.chat.completions.create(**api_args)
+            response = await self.openai_client.chat.completions.create(**api_args)
 
             content = response.choices[0].message.content
 
@@ -1215,7 +1325,7 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
             )
 
         except Exception as e:
-            print(f"[ERR] Error generating accional response with instructions: {e}")
+            logger.error("Error generating accional response with instructions: %s", e)
             return AccionalResponse(
                 content="Error generando plan de accion. Intenta nuevamente.",
                 priority="media",
@@ -1304,22 +1414,49 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         """
         Formatea el contexto relevante para el prompt
         """
-        formatted_context = ""
-        for item in context:
-            formatted_context += f"Fuente: {item['source']}\n"
-            formatted_context += f"Contenido: {item['content']}\n\n"
-        return formatted_context
+        return "".join(
+            f"Fuente: {item['source']}\nContenido: {item['content']}\n\n" for item in context
+        )
 
     def _format_history(self, history: List[Dict]) -> str:
         """
         Formatea el historial de la conversacion para el prompt
         """
-        formatted_history = ""
-        for message in history:
-            role = message.get('role', 'desconocido')
-            content = message.get('content', 'sin contenido')
-            formatted_history += f"{role}: {content}\n"
-        return formatted_history
+        return "".join(
+            f"{message.get('role', 'desconocido')}: {message.get('content', 'sin contenido')}\n"
+            for message in history
+        )
+
+    def _format_recent_history(self, history: List[Dict]) -> str:
+        """
+        Ultimos 10 mensajes del historial para los prompts de conversacion
+        """
+        if not history:
+            return ""
+
+        parts = ["## HISTORIAL DE CONVERSACION:\n"]
+        for msg in history[-10:]:
+            role_label = "Usuario" if msg.get("role") == "user" else "Asistente (tu)"
+            parts.append(f"*{role_label}* ({msg.get('timestamp', '')}): {msg.get('content', '')}\n\n")
+        parts.append("---\n\n")
+        return "".join(parts)
+
+    def _format_key_info(self, key_info: Optional[Dict[str, Any]]) -> str:
+        """
+        Informacion clave conocida de la conversacion (empresa, industria, objetivos)
+        """
+        if not key_info:
+            return ""
+
+        parts = ["## INFORMACION CLAVE CONOCIDA:\n"]
+        if key_info.get("company_name"):
+            parts.append(f"- Empresa: {key_info['company_name']}\n")
+        if key_info.get("industry"):
+            parts.append(f"- Industria: {key_info['industry']}\n")
+        if key_info.get("objectives"):
+            parts.append(f"- Objetivos: {', '.join(key_info['objectives'])}\n")
+        parts.append("\n")
+        return "".join(parts)
 
     async def _generate_default_clarification(self, message: str) -> List[ClarificationQuestion]:
         """
@@ -1360,6 +1497,45 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
 
         return conceptual, accional
 
+    def _format_prompt_context(self, context: List[Dict]) -> str:
+        """
+        Agrupa el contexto relevante por origen (proyecto, empresa, adicional)
+        """
+        project_parts = []
+        company_parts = []
+        general_parts = []
+        for ctx in context:
+            category = ctx.get('category', '')
+            if 'project' in category:
+                project_parts.append(ctx)
+            elif category == 'company_knowledge':
+                company_parts.append(ctx)
+            else:
+                general_parts.append(ctx)
+
+        parts = []
+        if project_parts:
+            parts.append("## [IMPORTANT] CONTEXTO DEL PROYECTO (MAXIMA PRIORIDAD - USA ESTO PRIMERO):\n")
+            for i, doc in enumerate(project_parts, 1):
+                source = doc.get('source', 'documento_proyecto')
+                priority = doc.get('priority', 0)
+                parts.append(f"{i}. *{source}* (Prioridad {priority}):\n{doc.get('content', '')[:1800]}\n\n")
+
+        if company_parts:
+            parts.append("## CONTEXTO DE FUENTES DE CONOCIMIENTO DE LA EMPRESA:\n")
+            for i, doc in enumerate(company_parts, 1):
+                source = doc.get('source', 'documento')
+                priority = doc.get('priority', 5)
+                parts.append(f"{i}. *{source}* (Prioridad {priority}):\n{doc.get('content', '')[:1800]}\n\n")
+
+        if general_parts:
+            parts.append("## CONTEXTO ADICIONAL (usar solo si es necesario):\n")
+            for i, doc in enumerate(general_parts, 1):
+                source = doc.get('source', 'documento')
+                parts.append(f"{i}. *{source}*:\n{doc.get('content', '')[:1000]}\n\n")
+
+        return "".join(parts)
+
     def _compile_knowledge(self, knowledge: List[Dict]) -> str:
         """
         Compila el conocimiento en un texto coherente
@@ -1367,16 +1543,19 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         if not knowledge:
             return "No hay fuentes de conocimiento especificas configuradas."
 
-        compiled = "FUENTES DE CONOCIMIENTO ESPECIFICAS:\n\n"
+        cached = self._get_compiled("knowledge", knowledge)
+        if cached is not None:
+            return cached
+
+        parts = ["FUENTES DE CONOCIMIENTO ESPECIFICAS:\n\n"]
 
         for i, doc in enumerate(knowledge, 1):
             filename = doc.get('filename', f'documento_{i}')
             content = doc.get('content', '')
 
-            compiled += f"## DOCUMENTO {i} - {filename}\n"
-            compiled += f"{content}\n\n"
+            parts.append(f"## DOCUMENTO {i} - {filename}\n{content}\n\n")
 
-        return compiled
+        return self._set_compiled("knowledge", knowledge, "".join(parts))
 
     def _build_enhanced_conversation_prompt(
         self,
@@ -1396,56 +1575,10 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         if attachments:
             attachments_context = self.attachment_handler.format_attachments_for_context(attachments)
 
-        project_context = [ctx for ctx in context if 'project' in ctx.get('category', '')]
-        company_context = [ctx for ctx in context if ctx.get('category') == 'company_knowledge']
-        general_context = [ctx for ctx in context if ctx.get('category') not in ['company_knowledge', 'project_knowledge', 'project_vector_search']]
+        context_text = self._format_prompt_context(context)
 
-        context_text = ""
-
-        if project_context:
-            context_text += "## [IMPORTANT] CONTEXTO DEL PROYECTO (MAXIMA PRIORIDAD - USA ESTO PRIMERO):\n"
-            for i, doc in enumerate(project_context, 1):
-                content = doc.get('content', '')[:1800]
-                source = doc.get('source', 'documento_proyecto')
-                priority = doc.get('priority', 0)
-                context_text += f"{i}. *{source}* (Prioridad {priority}):\n{content}\n\n"
-
-        if company_context:
-            context_text += "## CONTEXTO DE FUENTES DE CONOCIMIENTO DE LA EMPRESA:\n"
-            for i, doc in enumerate(company_context, 1):
-                content = doc.get('content', '')[:1800]
-                source = doc.get('source', 'documento')
-                priority = doc.get('priority', 5)
-                context_text += f"{i}. *{source}* (Prioridad {priority}):\n{content}\n\n"
-
-        if general_context:
-            context_text += "## CONTEXTO ADICIONAL (usar solo si es necesario):\n"
-            for i, doc in enumerate(general_context, 1):
-                content = doc.get('content', '')[:1000]
-                source = doc.get('source', 'documento')
-                context_text += f"{i}. *{source}*:\n{content}\n\n"
-
-        history_text = ""
-        if history and len(history) > 0:
-            history_text = "## HISTORIAL DE CONVERSACION:\n"
-            recent_history = history[-10:] if len(history) > 10 else history
-            for msg in recent_history:
-                role_label = "Usuario" if msg.get("role") == "user" else "Asistente (tu)"
-                content = msg.get("content", "")
-                timestamp = msg.get("timestamp", "")
-                history_text += f"*{role_label}* ({timestamp}): {content}\n\n"
-            history_text += "---\n\n"
-
-        key_info_text = ""
-        if key_info:
-            key_info_text = "## INFORMACION CLAVE CONOCIDA:\n"
-            if key_info.get("company_name"):
-                key_info_text += f"- Empresa: {key_info['company_name']}\n"
-            if key_info.get("industry"):
-                key_info_text += f"- Industria: {key_info['industry']}\n"
-            if key_info.get("objectives"):
-                key_info_text += f"- Objetivos: {', '.join(key_info['objectives'])}\n"
-            key_info_text += "\n"
+        history_text = self._format_recent_history(history)
+        key_info_text = self._format_key_info(key_info)
 
         if response_type == "conceptual":
             project_emphasis = ""
@@ -1525,56 +1658,10 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         if attachments:
             attachments_context = self.attachment_handler.format_attachments_for_context(attachments)
 
-        project_context = [ctx for ctx in context if 'project' in ctx.get('category', '')]
-        company_context = [ctx for ctx in context if ctx.get('category') == 'company_knowledge']
-        general_context = [ctx for ctx in context if ctx.get('category') not in ['company_knowledge', 'project_knowledge', 'project_vector_search']]
+        context_text = self._format_prompt_context(context)
 
-        context_text = ""
-
-        if project_context:
-            context_text += "## [IMPORTANT] CONTEXTO DEL PROYECTO (MAXIMA PRIORIDAD - USA ESTO PRIMERO):\n"
-            for i, doc in enumerate(project_context, 1):
-                content = doc.get('content', '')[:1800]
-                source = doc.get('source', 'documento_proyecto')
-                priority = doc.get('priority', 0)
-                context_text += f"{i}. *{source}* (Prioridad {priority}):\n{content}\n\n"
-
-        if company_context:
-            context_text += "## CONTEXTO DE FUENTES DE CONOCIMIENTO DE LA EMPRESA:\n"
-            for i, doc in enumerate(company_context, 1):
-                content = doc.get('content', '')[:1800]
-                source = doc.get('source', 'documento')
-                priority = doc.get('priority', 5)
-                context_text += f"{i}. *{source}* (Prioridad {priority}):\n{content}\n\n"
-
-        if general_context:
-            context_text += "## CONTEXTO ADICIONAL (usar solo si es necesario):\n"
-            for i, doc in enumerate(general_context, 1):
-                content = doc.get('content', '')[:1000]
-                source = doc.get('source', 'documento')
-                context_text += f"{i}. *{source}*:\n{content}\n\n"
-
-        history_text = ""
-        if history and len(history) > 0:
-            history_text = "## HISTORIAL DE CONVERSACION:\n"
-            recent_history = history[-10:] if len(history) > 10 else history
-            for msg in recent_history:
-                role_label = "Usuario" if msg.get("role") == "user" else "Asistente (tu)"
-                content = msg.get("content", "")
-                timestamp = msg.get("timestamp", "")
-                history_text += f"*{role_label}* ({timestamp}): {content}\n\n"
-            history_text += "---\n\n"
-
-        key_info_text = ""
-        if key_info:
-            key_info_text = "## INFORMACION CLAVE CONOCIDA:\n"
-            if key_info.get("company_name"):
-                key_info_text += f"- Empresa: {key_info['company_name']}\n"
-            if key_info.get("industry"):
-                key_info_text += f"- Industria: {key_info['industry']}\n"
-            if key_info.get("objectives"):
-                key_info_text += f"- Objetivos: {', '.join(key_info['objectives'])}\n"
-            key_info_text += "\n"
+        history_text = self._format_recent_history(history)
+        key_info_text = self._format_key_info(key_info)
 
         project_emphasis = ""
         if project_id:
@@ -1667,7 +1754,9 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         model_name = ai_config.model_name if ai_config else settings.OPENAI_MODEL
         temperature = float(ai_config.temperature) if ai_config else 0.7
         # Use token budget manager for max_tokens
-        budget_info = self.token_budget.validate_and_adjust_tokens(system_prompt, prompt, response_mode="advanced")
+        budget_info = await asyncio.to_thread(
+            self.token_budget.validate_and_adjust_tokens, system_prompt, prompt, response_mode="advanced"
+        )
         max_tokens = budget_info["max_tokens"]
 
         try:
@@ -1678,7 +1767,7 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                 "temperature": temperature
             }
 
-            response = self.openai_client.chat.completions.create(**api_args)
+            response = await self.openai_client.chat.completions.create(**api_args)
 
             content = response.choices[0].message.content
 
@@ -1698,7 +1787,7 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
             )
 
         except Exception as e:
-            print(f"[ERR] Error generating conceptual response with instructions: {e}")
+            logger.error("Error generating conceptual response with instructions: %s", e)
             return ConceptualResponse(
                 content=f"## Analisis Conceptual\n\nEstoy teniendo dificultades tecnicas. Por favor, intenta nuevamente.\n\nError: {str(e)}",
                 sources=[],
@@ -1763,7 +1852,9 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
         model_name = ai_config.model_name if ai_config else settings.OPENAI_MODEL
         temperature = float(ai_config.temperature) if ai_config else settings.DEFAULT_TEMPERATURE
         # Use token budget manager for max_tokens
-        budget_info = self.token_budget.validate_and_adjust_tokens(system_prompt, prompt, response_mode="medium")
+        budget_info = await asyncio.to_thread(
+            self.token_budget.validate_and_adjust_tokens, system_prompt, prompt, response_mode="medium"
+        )
         max_tokens = budget_info["max_tokens"]
 
         if temperature < settings.DEFAULT_TEMPERATURE:
@@ -1777,10 +1868,10 @@ Tu estilo de respuesta debe ser IDENTICO al de ChatGPT.
                 "temperature": temperature
             }
 
-            response = self.openai_client.chat.completions.create(**api_args)
+            response = await self.openai_client.chat.completions.create(**api_args)
 
             return response.choices[0].message.content
 
         except Exception as e:
-            print(f"[ERR] Error generating normal response: {e}")
+            logger.error("Error generating normal response: %s", e)
             return "Lo siento, hubo un error al generar la respuesta. Por favor, intenta nuevamente."
@@ -5,6 +5,7 @@ Servicio para procesamiento inteligente de documentos
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 from app.services.company_service import CompanyDocumentService
+from app.models.company import CompanyDocument, STATUS_PENDING, STATUS_COMPLETED, STATUS_FAILED
 from app.models.schemas import DocumentCategory
 import re
 import asyncio
@@ -17,7 +18,7 @@ class DocumentProcessingService:
         """Procesar todos los documentos pendientes de una compania"""
         pending_docs = db.query(CompanyDocument).filter(
             CompanyDocument.company_id == company_id,
-            CompanyDocument.processing_status == "pending",
+            CompanyDocument.processing_status == STATUS_PENDING,
             CompanyDocument.is_active == True
         ).all()
         
@@ -29,10 +30,9 @@ class DocumentProcessingService:
         
         for doc in pending_docs:
             try:
-                # Actualizar estado a procesando
-                CompanyDocumentService.update_processing_status(
-                    db, doc.id, "processing"
-                )
+                # Estado intermedio: se escribe en lote y se descarta si el documento
+                # termina antes del proximo volcado
+                CompanyDocumentService.queue_processing_progress(doc)
                 
                 # Procesar segun categoria
                 if doc.category == DocumentCategory.KNOWLEDGE_BASE:
@@ -44,18 +44,18 @@ class DocumentProcessingService:
                 
                 if success:
                     CompanyDocumentService.update_processing_status(
-                        db, doc.id, "completed", processed_chunks=1, total_chunks=1
+                        db, doc.id, STATUS_COMPLETED, processed_chunks=1, total_chunks=1
                     )
                     results["processed"].append(doc.filename)
                 else:
                     CompanyDocumentService.update_processing_status(
-                        db, doc.id, "failed", error_message="Error en procesamiento"
+                        db, doc.id, STATUS_FAILED, error_message="Error en procesamiento"
                     )
                     results["failed"].append(doc.filename)
                     
             except Exception as e:
                 CompanyDocumentService.update_processing_status(
-                    db, doc.id, "failed", error_message=str(e)
+                    db, doc.id, STATUS_FAILED, error_message=str(e)
                 )
                 results["failed"].append(doc.filename)
         
@@ -65,9 +65,7 @@ class DocumentProcessingService:
     async def _process_knowledge_document(db: Session, document) -> bool:
         """Procesar documento de fuentes de conocimiento"""
         try:
-            content = CompanyDocumentService.get_document_content(
-                db, document.company_id, document.id
-            )
+            content = await CompanyDocumentService.read_document_file_async(document)
             if not content:
                 return False
             
@@ -87,9 +85,7 @@ class DocumentProcessingService:
     async def _process_instruction_document(db: Session, document) -> bool:
         """Procesar documento de instrucciones"""
         try:
-            content = CompanyDocumentService.get_document_content(
-                db, document.company_id, document.id
-            )
+            content = await CompanyDocumentService.read_document_file_async(document)
             if not content:
                 return False
             
@@ -109,9 +105,7 @@ class DocumentProcessingService:
     async def _process_general_document(db: Session, document) -> bool:
         """Procesar documento general"""
         try:
-            content = CompanyDocumentService.get_document_content(
-                db, document.company_id, document.id
-            )
+            content = await CompanyDocumentService.read_document_file_async(document)
             if not content:
                 return False
             
@@ -170,30 +164,35 @@ class DocumentProcessingService:
     @staticmethod
     def get_company_knowledge_summary(db: Session, company_id: int) -> Dict[str, Any]:
         """Obtener resumen del conocimiento procesado de una compania"""
-        knowledge_docs = CompanyDocumentService.get_knowledge_base_documents(db, company_id)
-        instruction_docs = CompanyDocumentService.get_instruction_documents(db, company_id)
+        docs_by_category = CompanyDocumentService.get_company_documents_by_categories(
+            db, company_id, [DocumentCategory.KNOWLEDGE_BASE, DocumentCategory.INSTRUCTIONS]
+        )
+        knowledge_docs = docs_by_category[DocumentCategory.KNOWLEDGE_BASE]
+        instruction_docs = docs_by_category[DocumentCategory.INSTRUCTIONS]
         
         summary = {
             "knowledge_base": {
                 "total_documents": len(knowledge_docs),
-                "processed_documents": len([d for d in knowledge_docs if d.processing_status == "completed"]),
+                "processed_documents": 0,
                 "key_areas": [],
                 "priority_distribution": {}
             },
             "instructions": {
                 "total_documents": len(instruction_docs),
-                "processed_documents": len([d for d in instruction_docs if d.processing_status == "completed"]),
+                "processed_documents": 0,
                 "rule_count": 0,
                 "priority_distribution": {}
             }
         }
         
-        # Analizar distribucion de prioridades
-        for doc in knowledge_docs + instruction_docs:
-            category = "knowledge_base" if doc.category == DocumentCategory.KNOWLEDGE_BASE else "instructions"
-            priority = f"priority_{doc.priority}"
-            if priority not in summary[category]["priority_distribution"]:
-                summary[category]["priority_distribution"][priority] = 0
-            summary[category]["priority_distribution"][priority] += 1
+        # Una sola pasada por categoria para documentos procesados y prioridades
+        for category, docs in (("knowledge_base", knowledge_docs), ("instructions", instruction_docs)):
+            category_summary = summary[category]
+            priority_distribution = category_summary["priority_distribution"]
+            for doc in docs:
+                if doc.processing_status == STATUS_COMPLETED:
+                    category_summary["processed_documents"] += 1
+                priority = f"priority_{doc.priority}"
+                priority_distribution[priority] = priority_distribution.get(priority, 0) + 1
         
         return summary
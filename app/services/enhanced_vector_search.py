@@ -29,7 +29,8 @@ class EnhancedVectorSearchService:
         top_k: int = 25,
         min_score: float = 0.3,
         filter_by_recency: bool = False,
-        recency_days: int = 30
+        recency_days: int = 30,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """
         Realiza busqueda avanzada con multiples criterios
@@ -43,7 +44,8 @@ class EnhancedVectorSearchService:
                 query,
                 top_k=top_k * 2,  # Obtener mas para reranking
                 company_id=company_id,
-                project_id=project_id
+                project_id=project_id,
+                query_embedding=query_embedding
             )
             
             # Filtrar por puntuacion minima
@@ -202,7 +204,8 @@ class EnhancedVectorSearchService:
         company_id: Optional[int] = None,
         project_id: Optional[int] = None,
         top_k: int = 25,
-        min_score: float = 0.3  # Added min_score parameter
+        min_score: float = 0.3,  # Added min_score parameter
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """
         Busqueda hibrida: combina semantica + termino exacto
@@ -215,7 +218,8 @@ class EnhancedVectorSearchService:
                 company_id=company_id,
                 project_id=project_id,
                 top_k=top_k,
-                min_score=min_score  # Pass min_score to advanced_similarity_search
+                min_score=min_score,  # Pass min_score to advanced_similarity_search
+                query_embedding=query_embedding
             )
             
             # Busqueda por terminos exactos (bonus)
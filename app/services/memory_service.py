@@ -47,7 +47,8 @@ class MemoryService:
         
         return conversation
     
-    def add_message(self, db: Session, session_id: str, role: str, content: str, metadata: Dict = None) -> Message:
+    def add_message(self, db: Session, session_id: str, role: str, content: str, metadata: Dict = None,
+                    commit: bool = True) -> Message:
         """
         Anade un mensaje a la conversacion
         
@@ -57,6 +58,7 @@ class MemoryService:
             role: Rol del mensaje ('user' o 'assistant')
             content: Contenido del mensaje
             metadata: Metadatos adicionales del mensaje
+            commit: Si es False solo hace flush y el llamador controla la transaccion
         """
         conversation = self.get_or_create_conversation(db, session_id)
         
@@ -78,14 +80,20 @@ class MemoryService:
         )
         
         db.add(message)
-        db.commit()
-        db.refresh(message)
         
         # Actualizar titulo de conversacion si es el primer mensaje del usuario
         if role == "user" and conversation.title == "Nueva Conversacion":
             title = content[:50] + "..." if len(content) > 50 else content
             conversation.title = title
+        
+        if commit:
             db.commit()
+            db.refresh(message)
+            # Con commit=False el llamador invalida tras confirmar la transaccion
+            from app.services.chat_service import invalidate_conversation_analytics
+            invalidate_conversation_analytics(conversation.user_id)
+        else:
+            db.flush()
         
         # Limpiar mensajes antiguos si excedemos el limite de memoria
         self._cleanup_old_messages(db, conversation.id)
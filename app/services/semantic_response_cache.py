@@ -0,0 +1,144 @@
+"""
+Cache semantico de respuestas por compania
+Reutiliza la respuesta de una consulta casi identica respondida hace poco
+sin volver a llamar a OpenAI
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.schemas import ConceptualResponse, AccionalResponse
+
+CachedResponses = Tuple[ConceptualResponse, AccionalResponse]
+
+
+def normalize_query(text: str) -> str:
+    """Minusculas y espacios colapsados: base de la clave exacta"""
+    return " ".join(text.lower().split())
+
+
+class SemanticResponseCache:
+    """
+    Cache en memoria particionado por (compania, modo de respuesta)
+
+    - Ruta rapida: hash del texto normalizado, sin calcular embedding
+    - Ruta semantica: similitud coseno contra los embeddings guardados
+      (vectores normalizados, un producto matriz-vector por consulta)
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = 60,
+        threshold: float = 0.95,
+        max_entries_per_partition: int = 256
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.max_entries = max_entries_per_partition
+        # particion -> {hash_texto: (expira, embedding, respuestas)}
+        self._entries: Dict[Tuple[int, str], "OrderedDict[str, tuple]"] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _text_key(message: str) -> str:
+        return hashlib.md5(normalize_query(message).encode()).hexdigest()
+
+    def _live_partition(self, partition: Tuple[int, str]) -> "OrderedDict[str, tuple]":
+        """Devuelve la particion descartando entradas vencidas"""
+        entries = self._entries.get(partition)
+        if not entries:
+            return OrderedDict()
+        now = time.monotonic()
+        for key in [k for k, (expires, _, _) in entries.items() if expires <= now]:
+            del entries[key]
+        return entries
+
+    def get_exact(self, company_id: int, mode: str, message: str) -> Optional[CachedResponses]:
+        """Busca por texto normalizado, sin embedding"""
+        with self._lock:
+            entry = self._live_partition((company_id, mode)).get(self._text_key(message))
+            if entry is None:
+                return None
+            self.hits += 1
+            return self._copy(entry[2])
+
+    def get_similar(self, company_id: int, mode: str, embedding: List[float]) -> Optional[CachedResponses]:
+        """Busca el vecino mas cercano; acierto si coseno >= threshold"""
+        query = self._normalize(embedding)
+        with self._lock:
+            entries = self._live_partition((company_id, mode))
+            if not entries:
+                self.misses += 1
+                return None
+            candidates = list(entries.values())
+            scores = np.stack([entry[1] for entry in candidates]) @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._copy(candidates[best][2])
+
+    def store(
+        self,
+        company_id: int,
+        mode: str,
+        message: str,
+        embedding: List[float],
+        responses: CachedResponses
+    ) -> None:
+        """Guarda la respuesta con TTL; descarta la mas antigua si la particion esta llena"""
+        vector = self._normalize(embedding)
+        with self._lock:
+            entries = self._entries.setdefault((company_id, mode), OrderedDict())
+            key = self._text_key(message)
+            entries.pop(key, None)
+            entries[key] = (time.monotonic() + self.ttl_seconds, vector, responses)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def invalidate_company(self, company_id: int) -> None:
+        """Descarta las respuestas de una compania (cambio de documentos o configuracion)"""
+        with self._lock:
+            for partition in [p for p in self._entries if p[0] == company_id]:
+                del self._entries[partition]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "partitions": len(self._entries),
+                "entries": sum(len(entries) for entries in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    @staticmethod
+    def _copy(responses: CachedResponses) -> CachedResponses:
+        """Copias: quien recibe la respuesta puede modificarla sin tocar el cache"""
+        conceptual, accional = responses
+        return conceptual.model_copy(deep=True), accional.model_copy(deep=True)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+# Instancia global compartida por las sesiones de este proceso (no entre workers)
+semantic_response_cache = SemanticResponseCache(
+    ttl_seconds=settings.SEMANTIC_CACHE_TTL,
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD
+)
@@ -3,6 +3,7 @@ Servicio avanzado de optimizacion de tokens para maximizar el potencial de la IA
 Gestiona el presupuesto de tokens, compresion inteligente y cache de contexto
 """
 
+import os
 import tiktoken
 from typing import Dict, List, Any, Tuple, Optional
 from datetime import datetime, timedelta
@@ -11,6 +12,9 @@ import json
 from sqlalchemy.orm import Session
 from app.core.config import settings
 
+# tiktoken tokeniza los lotes en Rust con hilos propios (libera el GIL)
+TOKENIZER_THREADS = min(8, os.cpu_count() or 1)
+
 class TokenOptimizerService:
     """
     Servicio para optimizar el uso de tokens en conversaciones
@@ -85,6 +89,17 @@ class TokenOptimizerService:
         except Exception as e:
             print(f"Error contando tokens: {e}")
             return len(text.split()) * 1.3  # Estimacion aproximada
+
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Contar tokens de varios textos en una sola llamada al tokenizer"""
+        try:
+            return [
+                len(tokens)
+                for tokens in self.encoding.encode_ordinary_batch(texts, num_threads=TOKENIZER_THREADS)
+            ]
+        except Exception as e:
+            print(f"Error contando tokens en lote: {e}")
+            return [self.count_tokens(text) for text in texts]
     
     def compress_context(self, context: List[Dict[str, Any]], max_tokens: int) -> List[Dict[str, Any]]:
         """
@@ -110,9 +125,10 @@ class TokenOptimizerService:
             key=lambda x: (priority_order.get(x.get('category'), 99), -x.get('relevance_score', 0))
         )
         
-        for item in sorted_context:
+        token_counts = self.count_tokens_batch([item.get('content', '') for item in sorted_context])
+
+        for item, item_tokens in zip(sorted_context, token_counts):
             content = item.get('content', '')
-            item_tokens = self.count_tokens(content)
             
             if item_tokens > 3000:
                 compressed_content = self._compress_single_document(content, 2500)
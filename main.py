@@ -11,6 +11,8 @@ from starlette.middleware.sessions import SessionMiddleware
 from contextlib import asynccontextmanager
 import uvicorn
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
 
 from app.api.endpoints.health import router as health_router
@@ -36,8 +38,12 @@ from app.db.database import init_db
 # Cargar variables de entorno
 load_dotenv()
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+# Configurar logging: los hilos de peticion solo encolan el registro;
+# el formateo y la escritura a stderr ocurren en el hilo del QueueListener
+log_queue: queue.SimpleQueue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, logging.StreamHandler(), respect_handler_level=True)
+logging.basicConfig(level=settings.LOG_LEVEL, handlers=[QueueHandler(log_queue)])
+log_listener.start()
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
@@ -66,6 +72,7 @@ async def lifespan(app: FastAPI):
     # Shutdown: Limpiar recursos
     logger.info("Cerrando conexiones...")
     await vector_store.close()
+    log_listener.stop()
 
 # Crear aplicacion FastAPI
 app = FastAPI(
@@ -0,0 +1,15 @@
+-- Migration 011: Composite indexes on company_documents
+-- Listados activos por categoria ordenados por prioridad y filtros por estado
+
+CREATE INDEX IF NOT EXISTS ix_doc_cmp_active_cat_prio
+    ON company_documents (company_id, is_active, category, priority)
+    INCLUDE (filename, file_path);
+
+CREATE INDEX IF NOT EXISTS ix_doc_cmp_status
+    ON company_documents (company_id, processing_status);
+
+-- Verification query
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'company_documents'
+  AND indexname IN ('ix_doc_cmp_active_cat_prio', 'ix_doc_cmp_status');
@@ -0,0 +1,15 @@
+-- Migration 009: Normalized industry key for companies
+-- Columna generada lower(btrim(industry)) para evitar normalizar en cada llamada
+-- y permitir busquedas indexadas por industria
+
+ALTER TABLE companies
+    ADD COLUMN IF NOT EXISTS industry_key VARCHAR(255)
+    GENERATED ALWAYS AS (lower(btrim(industry))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_companies_industry_key
+    ON companies (industry_key);
+
+-- Verification query
+SELECT industry_key, COUNT(*) AS count
+FROM companies
+GROUP BY industry_key;
@@ -0,0 +1,18 @@
+-- Migration 012: Unique company names
+-- find_or_create_company inserta con ON CONFLICT (name) DO NOTHING, que requiere un indice unico.
+-- Si la creacion falla, resolver primero los nombres duplicados que lista la primera consulta.
+
+SELECT name, COUNT(*) AS duplicates
+FROM companies
+GROUP BY name
+HAVING COUNT(*) > 1;
+
+DROP INDEX IF EXISTS ix_companies_name;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_companies_name ON companies (name);
+
+-- Verification query
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'companies'
+  AND indexname = 'ix_companies_name';
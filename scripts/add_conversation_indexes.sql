@@ -0,0 +1,23 @@
+-- Migration 005: Composite indexes for conversation/message access paths
+-- Matches the dominant filters (user_id, is_active) and orderings (updated_at, created_at)
+
+-- Listado de conversaciones del usuario ordenado por ultima actividad
+CREATE INDEX IF NOT EXISTS idx_conversations_user_active_updated
+    ON conversations(user_id, is_active, updated_at DESC);
+
+-- Analiticas por periodo (filtro por created_at)
+CREATE INDEX IF NOT EXISTS idx_conversations_user_active_created
+    ON conversations(user_id, is_active, created_at);
+
+-- Mensajes de una conversacion en orden cronologico (tambien cubre el JOIN por conversation_id)
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_timestamp
+    ON messages(conversation_id, timestamp);
+
+-- Verification query
+SELECT indexname, tablename
+FROM pg_indexes
+WHERE indexname IN (
+    'idx_conversations_user_active_updated',
+    'idx_conversations_user_active_created',
+    'idx_messages_conversation_timestamp'
+);
@@ -0,0 +1,15 @@
+-- Migration 008: Flag for auto-generated conversation titles
+-- Reemplaza la deteccion por subcadena ("Chat" + "/") en update_conversation_from_first_message
+
+ALTER TABLE conversations
+    ADD COLUMN IF NOT EXISTS title_is_auto BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- Marcar los titulos automaticos existentes con la misma heuristica que se usaba antes
+UPDATE conversations
+SET title_is_auto = TRUE
+WHERE title LIKE '%Chat%' AND title LIKE '%/%';
+
+-- Verification query
+SELECT 'conversations with auto title' AS status, COUNT(*) AS count
+FROM conversations
+WHERE title_is_auto = TRUE;
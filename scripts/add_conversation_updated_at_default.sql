@@ -0,0 +1,15 @@
+-- Migration 007: Server-side default for conversations.updated_at
+-- updated_at lo asigna la base de datos (NOW()) en lugar de datetime.utcnow() desde Python
+
+ALTER TABLE conversations
+    ALTER COLUMN updated_at SET DEFAULT NOW();
+
+-- Rellenar conversaciones que nunca se actualizaron (necesario para la paginacion por cursor)
+UPDATE conversations
+SET updated_at = created_at
+WHERE updated_at IS NULL;
+
+-- Verification query
+SELECT 'conversations without updated_at' AS status, COUNT(*) AS count
+FROM conversations
+WHERE updated_at IS NULL;
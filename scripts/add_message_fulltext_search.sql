@@ -0,0 +1,14 @@
+-- Migration 006: Full-text search on messages.content
+-- Columna tsvector generada (diccionario spanish) con indice GIN para search_messages
+
+ALTER TABLE messages
+    ADD COLUMN IF NOT EXISTS content_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('spanish', content)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_messages_content_tsv ON messages USING GIN (content_tsv);
+
+-- Verification query
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'messages'
+  AND column_name = 'content_tsv';
@@ -0,0 +1,63 @@
+"""
+Script para verificar la cantidad de consultas SQL de los servicios de compania.
+Falla si algun metodo supera su limite (regresion N+1).
+Usage: python scripts/check_query_counts.py <company_id>
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.database import session_scope, count_queries
+from app.services.company_service import CompanyService, CompanyDocumentService
+from app.services.company_configuration_service import CompanyConfigurationService
+
+# Limite de consultas por metodo (con caches vacias)
+QUERY_LIMITS = {
+    "get_all_company_content": 1,
+    "get_processing_summary": 1,
+    "validate_company_setup": 1,
+    "get_full_configuration": 3,
+}
+
+def check(name, func):
+    """Ejecutar func con una sesion nueva y comparar las consultas emitidas con el limite"""
+    with session_scope() as db, count_queries() as statements:
+        func(db)
+    
+    limit = QUERY_LIMITS[name]
+    ok = len(statements) <= limit
+    print(f"[{'OK' if ok else 'FAIL'}] {name}: {len(statements)} consultas (limite {limit})")
+    if not ok:
+        for statement in statements:
+            print(f"    {statement.splitlines()[0][:100]}")
+    return ok
+
+def main(company_id: int) -> bool:
+    # Partir de caches vacias para medir el camino a la base de datos
+    with session_scope() as db:
+        CompanyService.invalidate_company_caches(db, company_id)
+    
+    results = [
+        check("get_all_company_content",
+              lambda db: CompanyDocumentService.get_all_company_content(db, company_id)),
+        check("get_processing_summary",
+              lambda db: CompanyDocumentService.get_processing_summary(db, company_id)),
+        check("validate_company_setup",
+              lambda db: CompanyConfigurationService.validate_company_setup(db, company_id)),
+        check("get_full_configuration",
+              lambda db: asyncio.run(CompanyConfigurationService.get_full_configuration(db, company_id))),
+    ]
+    return all(results)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python scripts/check_query_counts.py <company_id>")
+        sys.exit(2)
+    
+    print("=" * 50)
+    print("Checking query counts")
+    print("=" * 50)
+    sys.exit(0 if main(int(sys.argv[1])) else 1)
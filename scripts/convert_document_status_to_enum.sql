@@ -0,0 +1,18 @@
+-- Migration 010: processing_status como ENUM nativo de PostgreSQL
+-- Cada fila guarda 4 bytes en lugar del texto del estado y los valores invalidos se rechazan
+
+CREATE TYPE document_processing_status AS ENUM ('pending', 'processing', 'completed', 'failed');
+
+ALTER TABLE company_documents ALTER COLUMN processing_status DROP DEFAULT;
+
+ALTER TABLE company_documents
+    ALTER COLUMN processing_status TYPE document_processing_status
+    USING processing_status::document_processing_status;
+
+ALTER TABLE company_documents ALTER COLUMN processing_status SET DEFAULT 'pending';
+
+-- Verification query
+SELECT column_name, data_type, udt_name
+FROM information_schema.columns
+WHERE table_name = 'company_documents'
+  AND column_name = 'processing_status';